@@ -1,61 +1,132 @@
-import requests
-from flask import Flask, request, json, jsonify
+from flask import Flask, Response, request, json, jsonify
 import os
 from config import configs
+import collibra
+import metrics
+import upload
+import components
+from fingerprints import commit_pending, discard_pending, importing
+from jobs import JobManager, file_import, shards_import
 
 app = Flask(__name__)
-
-integration = open("./integration.json", "r")
+jobs = JobManager()
 
 # CORE API
 @app.route("/auth", methods=['POST'])
 def post_auth():
+    # the session is kept by the shared collibra client and used for every following call
+    if collibra.auth:
+        return jsonify(collibra.auth.login())
     auth = {
         'username': configs.get('collibra username'),
         'password': configs.get('collibra password'),
     }
-    data = requests.post(configs.get('collibra dgc') + "/rest/2.0/auth/sessions", json=auth).content
+    data = collibra.session.post(collibra.url("/auth/sessions"), json=auth).content
     return data
 
+@app.route("/auth/stats", methods=['GET'])
+def auth_stats():
+    return jsonify(collibra.auth_stats())
+
+# with a shard size set json-gen.py writes shards, they are imported phase by phase with several jobs in flight
+def sharded():
+    return configs.get('shard size') and os.path.exists(os.path.join(configs.get('shard directory', './shards'), "manifest.json"))
+
+# streams integration.json to an import endpoint, the response carries the collibra job and the upload stats
+# with 'delta export' set the collibra job is followed until it is finished, a completed import commits the pending fingerprints of the file's generation
+# (without the commit every delta run would export the same changes again)
+def upload_integration(path):
+    database = components.database()
+    generation = upload.read_generation("./integration.json")
+    with importing(database, generation):
+        response, stats = upload.post_file(path, "./integration.json", "integration")
+        try:
+            job = json.loads(response.content)
+        except ValueError:
+            job = response.text
+        result = {'job': job, 'upload': stats}
+        if configs.get('delta export', False) and response.ok and isinstance(job, dict):
+            result['job'] = upload.wait_for_job(job.get('id'))
+            if result['job'].get('state') == "COMPLETED":
+                result['fingerprints committed'] = commit_pending(database, generation)
+    return jsonify(result), response.status_code
+
 # IMPORT API
+# the pending fingerprints of the generation in the manifest are only committed once every shard is imported
+# a single integration.json import returns as soon as collibra accepted the file unless 'delta export' is set (see upload_integration)
+# generate.run refuses to replace the output while an import runs (see fingerprints.importing)
 @app.route("/import", methods=['POST'])
 def import_data():
-    files = {'file': open("integration.json", "rb")}
-    params = {
-        'sendNotification': True,
-        'batchSize': "10000",
-        'simulation': False,
-        'field': None,
-        'file': integration,
-        'fileName': "integration",
-        'deleteFile': False,
-    }
-    data = requests.post(
-        configs.get('collibra dgc') + "/rest/2.0/import/json-job",
-        data=params,
-        auth=(configs.get('collibra username'), configs.get('collibra password')),
-        files=files,
-    ).content
-    return data
+    if sharded():
+        database = components.database()
+        generation = upload.read_manifest().get('generation')
+        with importing(database, generation):
+            results = upload.upload_shards("/import/json-job")
+            if results and all(r.get('state') == "COMPLETED" for r in results):
+                commit_pending(database, generation)
+        return jsonify(results)
+    return upload_integration("/import/json-job")
 
 @app.route("/sync", methods=['POST'])
 def sync_data():
-    files = {'file': open("integration.json", "rb")}
-    params = {
-        'sendNotification': True,
-        'batchSize': "10000",
-        'simulation': False,
-        'field': None,
-        'file': integration,
-        'fileName': "integration",
-        'deleteFile': False,
-    }
-    data = requests.post(
-        configs.get('collibra dgc') + "/rest/2.0/import/synchronize/okera1/json-job",
-        data=params,
-        auth=(configs.get('collibra username'), configs.get('collibra password')),
-        files=files,
-    ).content
-    return data
+    if sharded():
+        database = components.database()
+        generation = upload.read_manifest().get('generation')
+        with importing(database, generation):
+            result = upload.sync_shards("okera1")
+            if result.get('shards') and all(r.get('state') == "COMPLETED" for r in result.get('shards')):
+                commit_pending(database, generation)
+        return jsonify(result)
+    return upload_integration("/import/synchronize/okera1/json-job")
+
+# drops the pending fingerprints of the last generation, so the next delta run exports its changes again
+@app.route("/fingerprints/pending", methods=['DELETE'])
+def drop_pending_fingerprints():
+    return jsonify({'discarded': discard_pending(components.database())})
+
+# latency histograms and error counts of all collibra calls made by this app and the collibra backend counters (retries, concurrency limit, circuit breaker), in prometheus text format
+@app.route("/metrics", methods=['GET'])
+def get_metrics():
+    return Response(metrics.prometheus(), mimetype = "text/plain; version=0.0.4")
+
+# JOBS API
+# same imports as /import and /sync, but they return a local job handle right away and run in the background
+@app.route("/jobs/import", methods=['POST'])
+def submit_import():
+    run = shards_import() if sharded() else file_import("/import/json-job", "./integration.json", "integration")
+    return jsonify(jobs.submit("import", run)), 202
+
+@app.route("/jobs/sync", methods=['POST'])
+def submit_sync():
+    run = shards_import("okera1") if sharded() else file_import("/import/synchronize/okera1/json-job", "./integration.json", "integration")
+    return jsonify(jobs.submit("sync", run)), 202
+
+@app.route("/jobs", methods=['GET'])
+def list_jobs():
+    return jsonify(jobs.list())
+
+@app.route("/jobs/<job_id>", methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': "unknown job " + job_id}), 404
+    return jsonify(job)
+
+# long-poll, returns once the job is finished or after ?timeout= seconds (default 30) with its current state
+@app.route("/jobs/<job_id>/wait", methods=['GET'])
+def wait_job(job_id):
+    try:
+        timeout = float(request.args.get('timeout', 30))
+    except ValueError:
+        return jsonify({'error': "timeout must be a number of seconds"}), 400
+    job = jobs.wait(job_id, min(max(timeout, 0), configs.get('job max wait', 300)))
+    if job is None:
+        return jsonify({'error': "unknown job " + job_id}), 404
+    return jsonify(job)
+
+# runs the flask server, port defaults to 'serve port' (flask's own default without it)
+def serve(port = None):
+    app.run(port = port or configs.get('serve port'))
 
-app.run()
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+import metrics
+
+# shared execution layer for the calls to one backend (collibra or okera)
+# every call waits for a slot of an adaptive concurrency limit, transient failures of idempotent calls are retried with jittered backoff
+# and a circuit breaker stops all calls once the backend keeps failing
+# settings come from a dict in config.py ('collibra backend', 'okera backend'), counters are exported through metrics.py
+
+class CircuitOpen(Exception):
+    pass
+
+# AIMD concurrency limit: +1 slot per limit successful calls (about one per round of calls), halved on throttling or a latency spike
+# a cut is made at most once per cooldown seconds, so the calls already in flight when the backend pushed back don't cut it again
+class AdaptiveLimit:
+    def __init__(self, initial, minimum, maximum, cooldown = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_cut = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def increase(self):
+        with self.condition:
+            before = int(self.limit)
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            if int(self.limit) > before:
+                self.condition.notify()
+
+    def decrease(self):
+        with self.condition:
+            now = time.monotonic()
+            if now - self.last_cut >= self.cooldown:
+                self.limit = max(self.minimum, self.limit / 2)
+                self.last_cut = now
+
+# closed: calls go through, failures consecutive failed calls open it
+# open: calls fail right away with CircuitOpen, after reset seconds a single probe call is let through (half open)
+# half open: the probe closes the breaker if it succeeds and opens it again if it fails
+class CircuitBreaker:
+    def __init__(self, failures, reset):
+        self.failures = failures
+        self.reset = reset
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened >= self.reset:
+                self.state = "half open"
+                return True
+            return False
+
+    # True while the breaker rejects calls, unlike allow() it never lets a probe through
+    def is_open(self):
+        with self.lock:
+            return self.state == "open" and time.monotonic() - self.opened < self.reset
+
+    def success(self):
+        with self.lock:
+            self.state = "closed"
+            self.consecutive = 0
+
+    def failure(self):
+        with self.lock:
+            self.consecutive += 1
+            if self.state == "half open" or (self.state == "closed" and self.consecutive >= self.failures):
+                self.state = "open"
+                self.opened = time.monotonic()
+                self.trips += 1
+
+class Backend:
+    def __init__(self, name, settings = None):
+        settings = settings or {}
+        self.name = name
+        self.limit = AdaptiveLimit(settings.get('concurrency', 4), settings.get('min concurrency', 1), settings.get('max concurrency', 16))
+        self.breaker = CircuitBreaker(settings.get('breaker failures', 10), settings.get('breaker reset', 60))
+        self.latency_target = settings.get('latency target')
+        self.retries = settings.get('retries', 3)
+        self.backoff = settings.get('backoff', 0.5)
+        self.max_backoff = settings.get('max backoff', 30)
+        self.lock = threading.Lock()
+        self.counts = {'calls': 0, 'retries': 0, 'throttled': 0, 'slow': 0, 'failed': 0, 'rejected': 0}
+        metrics.register("backend." + name, self.stats)
+
+    # "throttled" or "failed" for a result that signals an overloaded or broken backend (e.g. a 503 response), None if it is fine
+    def result_outcome(self, result):
+        return None
+
+    # "throttled" or "failed" for a transient exception worth retrying, None for errors that are the caller's (raised right away)
+    def error_outcome(self, error):
+        if isinstance(error, (OSError, TimeoutError)):
+            return "failed"
+        return None
+
+    # drops a result that is going to be retried (e.g. closes a response)
+    def discard(self, result):
+        pass
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    # jittered exponential backoff ("full jitter"): anywhere between 0 and backoff * 2^attempt, capped at max backoff
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    # runs fn(), one attempt per call of fn, and returns its result
+    # idempotent calls are retried up to 'retries' times on throttling or transient failures, others only when they were throttled
+    # calls that can't be sent twice (replayable = False, e.g. a streamed upload) are never retried
+    # watch_latency = False leaves long calls (e.g. uploads) out of the latency spike detection
+    # throttling (e.g. a 429) only cuts the concurrency limit, only failed calls count towards the circuit breaker
+    # a retry stopped by an open breaker raises the error (or returns the result) of the last attempt instead of CircuitOpen
+    def call(self, fn, idempotent = True, replayable = True, watch_latency = True):
+        attempt = 0
+        error = None
+        while True:
+            if not self.breaker.allow():
+                self.count('rejected')
+                if error is not None:
+                    raise error
+                raise CircuitOpen(self.name + " circuit breaker is open after " + str(self.breaker.consecutive) + " failed calls")
+            self.count('calls')
+            self.limit.acquire()
+            start = time.monotonic()
+            error = None
+            try:
+                result = fn()
+                outcome = self.result_outcome(result)
+            except Exception as e:
+                result, error = None, e
+                outcome = self.error_outcome(e)
+            finally:
+                self.limit.release()
+            elapsed = time.monotonic() - start
+            if error is not None and outcome is None:
+                # the backend answered, the request itself was wrong
+                self.breaker.success()
+                raise error
+            if outcome is None:
+                self.breaker.success()
+                if watch_latency and self.latency_target and elapsed > self.latency_target:
+                    self.count('slow')
+                    self.limit.decrease()
+                else:
+                    self.limit.increase()
+                return result
+            self.count(outcome)
+            if outcome == "throttled":
+                # the backend answered, it only wants fewer calls
+                self.breaker.success()
+                self.limit.decrease()
+            else:
+                self.breaker.failure()
+            if attempt >= self.retries or not replayable or not (idempotent or outcome == "throttled") or self.breaker.is_open():
+                if error is not None:
+                    raise error
+                return result
+            if result is not None:
+                self.discard(result)
+            attempt += 1
+            self.count('retries')
+            time.sleep(self.delay(attempt))
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        stats.update({'concurrency limit': round(self.limit.limit, 2), 'in flight': self.limit.in_flight, 'breaker': self.breaker.state, 'breaker trips': self.breaker.trips})
+        return stats
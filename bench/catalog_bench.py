@@ -0,0 +1,69 @@
+import collections
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from catalog import Catalog
+
+# benchmark for the diff phase of export.py
+# builds a synthetic collibra catalog and runs the same lookups the sync loop makes (tags + description per table and column)
+# time per asset should stay flat as the catalog grows, i.e. the diff phase scales linearly with catalog size
+# usage: python bench/catalog_bench.py [--linear]   (--linear also times the old find_info list scan on the small sizes)
+
+COLUMNS_PER_TABLE = 20
+SIZES = [1000, 10000, 100000, 1000000]
+
+def synthetic_assets(size):
+    assets = []
+    tables = max(1, size // (COLUMNS_PER_TABLE + 1))
+    for t in range(tables):
+        tab_name = "bench_db.table_" + str(t)
+        assets.append({'name': tab_name, 'display name': "table_" + str(t), 'description': "table " + str(t), 'type': "Table", 'domain': "Bench Data Dictionary", 'status': "Candidate", 'tags': ["bench.pii"] if t % 3 == 0 else None})
+        for c in range(COLUMNS_PER_TABLE):
+            col_name = tab_name + ".col_" + str(c)
+            assets.append({'name': col_name, 'display name': "col_" + str(c), 'description': None, 'type': "Column", 'domain': "Bench Data Dictionary", 'status': "Candidate", 'tags': ["bench.sensitive"] if c % 5 == 0 else None})
+    return assets
+
+# same shape as the export.py loop: two lookups per table and two per column, tags compared as Counters
+def diff(names, find_info):
+    changes = 0
+    okera_tags = ["bench.pii"]
+    for name in names:
+        collibra_tags = find_info(name, "tags")
+        if collibra_tags and collections.Counter(okera_tags) != collections.Counter(collibra_tags):
+            changes += 1
+        if find_info(name, "description"):
+            changes += 1
+    return changes
+
+def linear_find_info(assets):
+    def find_info(name, info):
+        for ue in assets:
+            if ue.get('name') == name:
+                return ue.get(info)
+    return find_info
+
+def run(size, linear):
+    assets = synthetic_assets(size)
+    names = [a.get('name') for a in assets]
+
+    start = time.perf_counter()
+    catalog = Catalog(assets)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    diff(names, catalog.info)
+    lookup = time.perf_counter() - start
+    print("indexed  %8d assets  build %8.3fs  diff %8.3fs  %6.2f us/asset" % (len(assets), build, lookup, (build + lookup) / len(assets) * 1e6))
+
+    if linear and size <= 10000:
+        start = time.perf_counter()
+        diff(names, linear_find_info(assets))
+        scan = time.perf_counter() - start
+        print("linear   %8d assets                  diff %8.3fs  %6.2f us/asset" % (len(assets), scan, scan / len(assets) * 1e6))
+
+if __name__ == "__main__":
+    linear = "--linear" in sys.argv
+    for size in SIZES:
+        run(size, linear)
@@ -0,0 +1,37 @@
+import gc
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from catalog import Catalog
+from catalog_bench import synthetic_assets
+
+# memory per asset of the collibra snapshot export.py builds, before (one dict per asset) and after (Catalog of Asset records)
+# the synthetic assets are re-created as export.py does it: fresh strings per /assets result, as decoded from JSON
+# usage: python bench/catalog_memory.py [size]
+
+def fresh(assets):
+    for a in assets:
+        # copies every string so nothing is shared with the generator's constants, like json.loads output
+        yield dict((k, (v + ".")[:-1] if isinstance(v, str) else (list((t + ".")[:-1] for t in v) if v else v)) for k, v in a.items())
+
+def measure(build, size):
+    assets = synthetic_assets(size)
+    gc.collect()
+    tracemalloc.start()
+    snapshot = build(fresh(assets))
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return current, len(snapshot)
+
+def dicts(assets):
+    return list(assets)
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    before, count = measure(dicts, size)
+    after, _ = measure(Catalog, size)
+    print("list of dicts  %8d assets  %10.1f MB  %6.0f bytes/asset" % (count, before / 1e6, before / count))
+    print("Catalog        %8d assets  %10.1f MB  %6.0f bytes/asset" % (count, after / 1e6, after / count))
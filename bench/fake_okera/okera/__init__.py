@@ -0,0 +1,100 @@
+import os
+import sys
+import threading
+import time
+
+# fake okera.context for the offline benchmarks, put bench/fake_okera first on PYTHONPATH to use it
+# the catalog comes from bench/synthetic.py, sized by BENCH_SCALE (columns) and BENCH_DATABASES
+# BENCH_OKERA_LATENCY adds a delay in seconds to every okera call
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+import synthetic
+
+scale = int(os.environ.get('BENCH_SCALE', 1000))
+databases = int(os.environ.get('BENCH_DATABASES', 1))
+latency = float(os.environ.get('BENCH_OKERA_LATENCY', 0))
+# BENCH_OKERA_FIRST_CALL is a file the time of the first okera call is written to (see bench/startup_bench.py)
+first_call = os.environ.get('BENCH_OKERA_FIRST_CALL')
+
+class Obj:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+def attribute_values(tags):
+    return [Obj(attribute = Obj(attribute_namespace = tag.split(".")[0], key = tag.split(".")[1])) for tag in tags]
+
+catalog = None
+catalog_lock = threading.Lock()
+
+# database -> datasets, built on first use
+def load():
+    global catalog
+    with catalog_lock:
+        if catalog is None:
+            catalog = dict((db, []) for db in synthetic.database_names(databases))
+            for db, table, columns, comment, tags in synthetic.tables(scale, databases):
+                cols = [Obj(name = name, type = Obj(type_id = type_id, precision = None, scale = None, len = None), comment = col_comment, attribute_values = attribute_values(col_tags)) for name, type_id, col_comment, col_tags in columns]
+                catalog[db].append(Obj(db = [db], name = table, description = comment, primary_storage = "HDFS", schema = Obj(cols = cols), attribute_values = attribute_values(tags)))
+    return catalog
+
+calls = {}
+calls_lock = threading.Lock()
+
+def record(op):
+    if latency:
+        time.sleep(latency)
+    with calls_lock:
+        if first_call and not calls:
+            with open(first_call, 'w') as f:
+                f.write(repr(time.time()))
+        calls[op] = calls.get(op, 0) + 1
+
+class Connection:
+    def list_databases(self):
+        record('list_databases')
+        return list(load().keys())
+
+    def list_dataset_names(self, database):
+        record('list_dataset_names')
+        return [database + "." + t.name for t in load().get(database, [])]
+
+    def list_datasets(self, database, name = None):
+        record('list_datasets')
+        return [t for t in load().get(database, []) if name is None or t.name == name]
+
+    def assign_attribute(self, *args, **kwargs):
+        record('assign_attribute')
+
+    def unassign_attribute(self, *args, **kwargs):
+        record('unassign_attribute')
+
+    def execute_ddl(self, ddl):
+        record('execute_ddl')
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class context:
+    def enable_token_auth(self, token_str = None):
+        pass
+
+    def connect(self, host = None, port = None):
+        record('connect')
+        return Connection()
+
+# writes the call counts to BENCH_OKERA_CALLS on exit so the benchmark runner can record them
+def dump_calls():
+    path = os.environ.get('BENCH_OKERA_CALLS')
+    if path:
+        import json
+        with open(path, 'w') as f:
+            json.dump(calls, f)
+
+import atexit
+atexit.register(dump_calls)
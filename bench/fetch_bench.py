@@ -0,0 +1,62 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, bench_dir)
+sys.path.insert(1, os.path.dirname(bench_dir))
+from stub_collibra import StubCollibra
+import config
+
+# compares the two ways export.py loads the collibra catalog against bench/stub_collibra.py
+# rest: paged /assets plus /attributes and /tags/asset/{id} per asset, output module: one streamed request, recorded: the same response replayed from disk
+# all three must build the same catalog, latency (seconds) is added to every stub request to show the cost of round trips
+# usage: python bench/fetch_bench.py [--scale 10000] [--latency 0.005]
+
+def rest_catalog(collibra, Catalog):
+    catalog = Catalog()
+    params = {'simulation': False, 'communityId': collibra.get_community_id(config.configs.get('community'))}
+    for page in collibra.iter_pages("/assets", params = params):
+        details = collibra.get_details([d.get('id') for d in page])
+        for d, (description, tags) in zip(page, details):
+            catalog.add({'name': d.get('name'), 'display name': d.get('displayName'), 'description': description, 'type': d.get('type').get('name'), 'domain': d.get('domain').get('name'), 'status': d.get('status').get('name'), 'tags': tags})
+    return catalog
+
+def output_module_catalog(collibra, Catalog, file = None):
+    catalog = Catalog()
+    for asset in collibra.export_assets(config.configs.get('community'), file):
+        catalog.add(asset)
+    return catalog
+
+def content(catalog):
+    return [(a.name, a.get('display name'), a.description, a.type, a.domain, a.status, a.tags) for a in catalog]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type = int, default = 10000)
+    parser.add_argument("--latency", type = float, default = 0.005, help = "seconds added to every stub collibra request")
+    args = parser.parse_args()
+    stub = StubCollibra(args.scale, latency = args.latency).start()
+    config.configs['collibra dgc'] = stub.url
+    import collibra
+    from catalog import Catalog
+    recorded = os.path.join(tempfile.mkdtemp(prefix = "collibra-fetch-"), "output_module.json")
+    with open(recorded, "wb") as f:
+        for chunk in stub.output_module_chunks():
+            f.write(chunk)
+    results = {}
+    try:
+        for name, load in [('rest', lambda: rest_catalog(collibra, Catalog)), ('output module', lambda: output_module_catalog(collibra, Catalog)), ('recorded', lambda: output_module_catalog(collibra, Catalog, recorded))]:
+            before = dict(stub.requests)
+            start = time.perf_counter()
+            catalog = load()
+            seconds = time.perf_counter() - start
+            requests = sum(stub.requests.values()) - sum(before.values())
+            results[name] = content(catalog)
+            print(name + ": " + str(len(catalog)) + " assets in " + str(round(seconds, 3)) + "s, " + str(requests) + " collibra requests")
+    finally:
+        stub.stop()
+        os.remove(recorded)
+    print("same catalog: " + str(results['rest'] == results['output module'] == results['recorded']))
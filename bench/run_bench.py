@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+repo = os.path.dirname(bench_dir)
+sys.path.insert(0, bench_dir)
+from stub_collibra import StubCollibra
+
+# offline end to end benchmark: json-gen.py generation, export.py diff-and-apply and the app.py /import upload
+# collibra is replaced by bench/stub_collibra.py, okera by the fake context in bench/fake_okera, mongodb has to run locally (seeded by db.py)
+# every run appends one record per scale to the results file, so timings can be compared between commits
+# usage: python bench/run_bench.py [--scales 1000 10000 100000 1000000] [--latency 0.0] [--okera-latency 0.0] [--output bench/results.json]
+
+# runs a repo script with config.py overridden, from workdir so its output files stay out of the repo
+boot = "import json, os, runpy, sys; sys.path.insert(1, os.environ['BENCH_REPO']); import config; config.configs.update(json.loads(os.environ['BENCH_CONFIG'])); runpy.run_path(os.path.join(os.environ['BENCH_REPO'], sys.argv[1]), run_name = '__main__')"
+
+def environment(scale, args, overrides, calls_file):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': os.path.join(bench_dir, "fake_okera") + os.pathsep + env.get('PYTHONPATH', ""),
+        'BENCH_REPO': repo,
+        'BENCH_CONFIG': json.dumps(overrides),
+        'BENCH_SCALE': str(scale),
+        'BENCH_DATABASES': str(args.databases),
+        'BENCH_OKERA_LATENCY': str(args.okera_latency),
+        'BENCH_OKERA_CALLS': calls_file,
+    })
+    return env
+
+def run_script(script, workdir, env):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-c", boot, script], cwd = workdir, env = env, capture_output = True, text = True)
+    result = {'seconds': round(time.perf_counter() - start, 3), 'returncode': process.returncode}
+    if process.returncode:
+        result['error'] = process.stderr[-2000:]
+    return result
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# starts app.py, times one POST /import of the generated integration.json, stops it again
+def run_upload(workdir, env):
+    port = free_port()
+    env = dict(env, FLASK_RUN_PORT = str(port))
+    app_boot = boot.replace("runpy.run_path", "import flask; flask.Flask.run = (lambda run: lambda self, *a, **k: run(self, port = int(os.environ['FLASK_RUN_PORT'])))(flask.Flask.run); runpy.run_path")
+    process = subprocess.Popen([sys.executable, "-c", app_boot, "app.py"], cwd = workdir, env = env, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True)
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout = 1).close()
+                break
+            except OSError:
+                if time.time() > deadline or process.poll() is not None:
+                    return {'returncode': process.poll(), 'error': "app.py did not start"}
+                time.sleep(0.1)
+        start = time.perf_counter()
+        request = urllib.request.Request("http://127.0.0.1:" + str(port) + "/import", method = "POST", data = b"")
+        with urllib.request.urlopen(request) as response:
+            body = json.loads(response.read())
+        return {'seconds': round(time.perf_counter() - start, 3), 'returncode': 0, 'upload': body.get('upload')}
+    except Exception as e:
+        return {'returncode': 1, 'error': str(e)}
+    finally:
+        process.terminate()
+        process.wait()
+
+def read_calls(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def bench(scale, args):
+    stub = StubCollibra(scale, args.databases, args.latency).start()
+    workdir = tempfile.mkdtemp(prefix = "collibra-bench-")
+    overrides = {'collibra dgc': stub.url, 'shard size': None, 'delta export': False}
+    record = {'scale': scale, 'assets': len(stub.assets), 'latency': args.latency, 'okera latency': args.okera_latency}
+    try:
+        for step, script in [('generate', "json-gen.py"), ('export', "export.py")]:
+            calls_file = os.path.join(workdir, step + "-okera-calls.json")
+            record[step] = run_script(script, workdir, environment(scale, args, overrides, calls_file))
+            record[step]['okera calls'] = read_calls(calls_file)
+        if os.path.exists(os.path.join(workdir, "integration.json")):
+            record['upload'] = run_upload(workdir, environment(scale, args, overrides, os.path.join(workdir, "upload-okera-calls.json")))
+        record['collibra requests'] = dict(stub.requests)
+    finally:
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors = True)
+    return record
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type = int, nargs = "+", default = [1000, 10000, 100000, 1000000])
+    parser.add_argument("--databases", type = int, default = 1)
+    parser.add_argument("--latency", type = float, default = 0.0, help = "seconds added to every stub collibra request")
+    parser.add_argument("--okera-latency", type = float, default = 0.0, help = "seconds added to every fake okera call")
+    parser.add_argument("--output", default = os.path.join(bench_dir, "results.json"))
+    args = parser.parse_args()
+
+    results = []
+    if os.path.exists(args.output):
+        with open(args.output) as f:
+            results = json.load(f)
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = repo, capture_output = True, text = True).stdout.strip()
+    for scale in args.scales:
+        record = bench(scale, args)
+        record.update({'commit': commit, 'time': time.strftime("%Y-%m-%dT%H:%M:%S")})
+        print(json.dumps(record))
+        results.append(record)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent = 1)
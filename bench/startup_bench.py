@@ -0,0 +1,116 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+repo = os.path.dirname(bench_dir)
+sys.path.insert(0, bench_dir)
+from stub_collibra import StubCollibra
+
+# cold start of the cli.py commands against bench/stub_collibra.py and the fake okera context in bench/fake_okera
+# imports: every module is imported in a fresh interpreter, none of them may call collibra or okera
+# commands: seconds from launching the process to its first collibra or okera call (generate, export) or to accepting connections (serve)
+# a cold start above --limit seconds fails the run, mongodb has to run locally as for bench/run_bench.py
+# usage: python bench/startup_bench.py [--scale 1000] [--limit 1.0]
+
+modules = ["cli", "components", "generate", "export", "watch", "db", "app", "harvest", "collibra", "okera_writer"]
+
+boot = "import json, os, runpy, sys; sys.path.insert(1, os.environ['BENCH_REPO']); import config; config.configs.update(json.loads(os.environ['BENCH_CONFIG'])); runpy.run_path(os.path.join(os.environ['BENCH_REPO'], 'cli.py'), run_name = '__main__')"
+import_boot = "import json, os, sys, time; start = time.perf_counter(); sys.path.insert(1, os.environ['BENCH_REPO']); import config; config.configs.update(json.loads(os.environ['BENCH_CONFIG'])); __import__(sys.argv[1]); print(time.perf_counter() - start)"
+
+def environment(scale, overrides, first_call):
+    env = dict(os.environ)
+    env.update({
+        'PYTHONPATH': os.path.join(bench_dir, "fake_okera") + os.pathsep + env.get('PYTHONPATH', ""),
+        'BENCH_REPO': repo,
+        'BENCH_CONFIG': json.dumps(overrides),
+        'BENCH_SCALE': str(scale),
+        'BENCH_OKERA_FIRST_CALL': first_call,
+    })
+    return env
+
+def read_time(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return float(f.read())
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def time_import(module, workdir, env):
+    process = subprocess.run([sys.executable, "-c", import_boot, module], cwd = workdir, env = env, capture_output = True, text = True)
+    if process.returncode:
+        return {'error': process.stderr[-2000:]}
+    return {'seconds': round(float(process.stdout.split()[-1]), 3)}
+
+# seconds until the first collibra request or okera call of the command, the command is stopped there
+def time_command(command, stub, workdir, env, first_call):
+    stub.first_request = None
+    if os.path.exists(first_call):
+        os.remove(first_call)
+    start = time.time()
+    process = subprocess.Popen([sys.executable, "-c", boot] + command, cwd = workdir, env = env, stdout = subprocess.DEVNULL, stderr = subprocess.PIPE, text = True)
+    try:
+        deadline = start + 30
+        while time.time() < deadline and process.poll() is None:
+            first = [t for t in (stub.first_request, read_time(first_call)) if t is not None]
+            if first:
+                return {'seconds': round(min(first) - start, 3)}
+            time.sleep(0.005)
+        return {'error': "no collibra or okera call", 'returncode': process.poll(), 'stderr': process.stderr.read()[-2000:] if process.poll() is not None else None}
+    finally:
+        process.kill()
+        process.wait()
+
+def time_serve(workdir, env):
+    port = free_port()
+    start = time.time()
+    process = subprocess.Popen([sys.executable, "-c", boot, "serve", "--port", str(port)], cwd = workdir, env = env, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+    try:
+        deadline = start + 30
+        while time.time() < deadline and process.poll() is None:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout = 1).close()
+                return {'seconds': round(time.time() - start, 3)}
+            except OSError:
+                time.sleep(0.005)
+        return {'error': "app did not start", 'returncode': process.poll()}
+    finally:
+        process.kill()
+        process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type = int, default = 1000)
+    parser.add_argument("--limit", type = float, default = 1.0, help = "seconds allowed for a cold start")
+    args = parser.parse_args()
+
+    stub = StubCollibra(args.scale).start()
+    workdir = tempfile.mkdtemp(prefix = "collibra-startup-")
+    first_call = os.path.join(workdir, "okera-first-call")
+    overrides = {'collibra dgc': stub.url, 'harvest snapshot': None, 'sync dry run': True}
+    env = environment(args.scale, overrides, first_call)
+    results = {'imports': {}, 'commands': {}}
+    try:
+        for module in modules:
+            results['imports'][module] = time_import(module, workdir, env)
+        results['import requests'] = dict(stub.requests)
+        for name, command in [('generate', ["generate"]), ('export', ["export", "--dry-run"])]:
+            results['commands'][name] = time_command(command, stub, workdir, env, first_call)
+        results['commands']['serve'] = time_serve(workdir, env)
+    finally:
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors = True)
+    print(json.dumps(results, indent = 1))
+    timings = list(results['imports'].values()) + list(results['commands'].values())
+    slow = [t for t in timings if t.get('error') or t.get('seconds') > args.limit]
+    if results['import requests'] or slow:
+        sys.exit(1)
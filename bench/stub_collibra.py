@@ -0,0 +1,212 @@
+import gzip
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import synthetic
+
+# local stand-in for the collibra REST API used by the offline benchmarks
+# serves /auth/sessions, /communities, /domains, /assets (paged), /attributes, /tags/asset/{id}, the import job endpoints and /jobs/{id}
+# and the output module export of all assets, streamed as a chunked table view response
+# assets come from bench/synthetic.py so they match the fake okera catalog, latency (seconds) is added to every request
+
+DESCRIPTION_TYPE_ID = "00000000-0000-0000-0000-000000003114"
+
+class StubCollibra:
+    def __init__(self, scale, databases = 1, latency = 0.0, community = "Okera2.0", domain = "Okera2.0 Data Dictionary", port = 0):
+        self.latency = latency
+        self.assets = []
+        self.by_id = {}
+        self.by_name = {}
+        # the catalog was last edited a day ago, one millisecond apart per asset
+        modified = int(time.time() * 1000) - 86400000
+        for i, asset in enumerate(synthetic.collibra_assets(scale, databases)):
+            record = {'id': "asset-" + str(i), 'name': asset.get('name'), 'displayName': asset.get('name').rsplit(".", 1)[-1], 'type': {'name': asset.get('type')}, 'domain': {'name': domain}, 'status': {'name': "Candidate"}, 'lastModifiedOn': modified + i}
+            self.assets.append(record)
+            self.by_id[record.get('id')] = asset
+            self.by_name[record.get('name')] = record
+        self.community = {'id': "community-1", 'name': community}
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.requests = {}
+        self.first_request = None
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        self.url = "http://127.0.0.1:" + str(self.server.server_address[1])
+
+    def start(self):
+        threading.Thread(target = self.server.serve_forever, daemon = True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # a steward edit: new description and/or tags for the asset called name, with lastModifiedOn set to now
+    def modify(self, name, description = None, tags = None):
+        with self.lock:
+            record = self.by_name[name]
+            asset = self.by_id[record.get('id')]
+            if description is not None:
+                asset['description'] = description
+            if tags is not None:
+                asset['tags'] = tags
+            record['lastModifiedOn'] = int(time.time() * 1000)
+
+    # output module table view rows (see collibra.asset_view) of all assets
+    def output_module_rows(self):
+        rows = []
+        for record in self.assets:
+            asset = self.by_id.get(record.get('id'))
+            rows.append({'id': record.get('id'), 'name': record.get('name'), 'displayName': record.get('displayName'), 'type': record.get('type').get('name'), 'status': record.get('status').get('name'), 'domain': record.get('domain').get('name'),
+                         'descriptions': [{'description': asset.get('description')}] if asset.get('description') else [], 'tags': [{'tag': t} for t in asset.get('tags') or []]})
+        return rows
+
+    # the output module response as it is sent, in pieces of about chunk_size bytes
+    def output_module_chunks(self, chunk_size = 65536):
+        rows = self.output_module_rows()
+        pending = '{"iTotalRecords": ' + str(len(rows)) + ', "iTotalDisplayRecords": ' + str(len(rows)) + ', "aaData": ['
+        for i, row in enumerate(rows):
+            pending += (", " if i else "") + json.dumps(row)
+            if len(pending) >= chunk_size:
+                yield pending.encode("utf-8")
+                pending = ""
+        yield (pending + "]}").encode("utf-8")
+
+    def count(self, name, received = 0):
+        with self.lock:
+            if self.first_request is None:
+                self.first_request = time.time()
+            self.requests[name] = self.requests.get(name, 0) + 1
+            self.bytes_received += received
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            # headers and body go out as separate writes, without TCP_NODELAY every keep-alive reply waits for a delayed ACK
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def reply(self, body, status = 200, headers = None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header('Content-Type', "application/json")
+                self.send_header('Content-Length', str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            # reads a plain or chunked request body and undoes gzip content encoding
+            def body(self):
+                if self.headers.get('Transfer-Encoding', "").lower() == "chunked":
+                    data = bytearray()
+                    while True:
+                        size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            break
+                        data += self.rfile.read(size)
+                        self.rfile.readline()
+                    data = bytes(data)
+                else:
+                    data = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.headers.get('Content-Encoding') == "gzip":
+                    return data, gzip.decompress(data)
+                return data, data
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                url = urlparse(self.path)
+                path = url.path.replace("/rest/2.0", "", 1).rstrip("/")
+                params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+                if path == "/communities":
+                    stub.count('communities')
+                    return self.reply({'total': 1, 'results': [stub.community]})
+                if path == "/domains":
+                    stub.count('domains')
+                    return self.reply({'total': 1, 'results': [{'id': "domain-" + params.get('name', ""), 'name': params.get('name')}]})
+                if path == "/assets":
+                    stub.count('assets')
+                    assets = stub.assets
+                    if params.get('name'):
+                        assets = [a for a in assets if a.get('name') == params.get('name')]
+                    if params.get('sortField') == "LAST_MODIFIED":
+                        assets = sorted(assets, key = lambda a: a.get('lastModifiedOn'), reverse = params.get('sortOrder') == "DESC")
+                    offset = int(params.get('offset', 0))
+                    limit = int(params.get('limit', 1000)) or len(assets)
+                    return self.reply({'total': len(assets), 'offset': offset, 'limit': limit, 'results': assets[offset:offset + limit]})
+                if path == "/attributes":
+                    stub.count('attributes')
+                    asset = stub.by_id.get(params.get('assetId'), {})
+                    results = [{'value': asset.get('description'), 'type': {'id': DESCRIPTION_TYPE_ID}}] if asset.get('description') else []
+                    return self.reply({'total': len(results), 'results': results})
+                if path.startswith("/tags/asset/"):
+                    stub.count('tags')
+                    asset = stub.by_id.get(path.rsplit("/", 1)[-1], {})
+                    return self.reply([{'name': t} for t in asset.get('tags') or []])
+                if path.startswith("/jobs/"):
+                    stub.count('jobs')
+                    job = stub.jobs.get(path.rsplit("/", 1)[-1])
+                    if job is None:
+                        return self.reply({'message': "no such job"}, 404)
+                    return self.reply(job)
+                self.reply({'message': "not stubbed: " + path}, 404)
+
+            def do_POST(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                raw, data = self.body()
+                path = urlparse(self.path).path.replace("/rest/2.0", "", 1)
+                if path == "/auth/sessions":
+                    stub.count('auth', len(raw))
+                    return self.reply({'id': "session", 'csrfToken': "csrf"}, headers = {'Set-Cookie': "JSESSIONID=stub; Path=/"})
+                if path == "/outputModule/export/json":
+                    stub.count('outputModule', len(raw))
+                    self.send_response(200)
+                    self.send_header('Content-Type', "application/json")
+                    self.send_header('Transfer-Encoding', "chunked")
+                    self.end_headers()
+                    for chunk in stub.output_module_chunks():
+                        self.wfile.write(("%x\r\n" % len(chunk)).encode("ascii") + chunk + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                if path.startswith("/import/"):
+                    stub.count('import', len(raw))
+                    job_id = "job-" + str(next(stub.job_ids))
+                    stub.jobs[job_id] = {'id': job_id, 'state': "COMPLETED", 'progressPercentage': 100, 'message': str(len(data)) + " bytes imported"}
+                    return self.reply({'id': job_id, 'state': "WAITING"})
+                self.reply({'message': "not stubbed: " + path}, 404)
+
+        return Handler
+
+if __name__ == "__main__":
+    scale = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    stub = StubCollibra(scale, port = 0 if "--record" in sys.argv else 8090)
+    # --record path writes the output module response to path (for 'collibra output module file') instead of serving
+    if "--record" in sys.argv:
+        path = sys.argv[sys.argv.index("--record") + 1]
+        with open(path, "wb") as f:
+            for chunk in stub.output_module_chunks():
+                f.write(chunk)
+        print("recorded output module response of " + str(len(stub.assets)) + " assets to " + path)
+        sys.exit(0)
+    print("stub collibra with " + str(len(stub.assets)) + " assets on " + stub.url)
+    stub.server.serve_forever()
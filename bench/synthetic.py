@@ -0,0 +1,31 @@
+# deterministic synthetic catalog shared by the fake okera context and the stub collibra server
+# scale is the total number of columns, spread over tables of COLUMNS_PER_TABLE columns in the given number of databases
+# the first database is okera_sample, the only one export.py syncs
+
+COLUMNS_PER_TABLE = 20
+TYPE_IDS = [0, 3, 4, 6, 7, 13]
+
+def database_names(databases):
+    return ["okera_sample"] + ["bench_db_" + str(i) for i in range(1, databases)]
+
+def table_count(scale):
+    return max(1, scale // COLUMNS_PER_TABLE)
+
+# yields (database, table name, [(column name, type id, comment, tags)], table comment, table tags)
+def tables(scale, databases = 1):
+    names = database_names(databases)
+    for t in range(table_count(scale)):
+        columns = []
+        for c in range(COLUMNS_PER_TABLE):
+            columns.append(("col_" + str(c), TYPE_IDS[c % len(TYPE_IDS)], "column " + str(c) if c % 2 == 0 else None, ["bench.pii"] if c % 7 == 0 else []))
+        yield names[t % len(names)], "table_" + str(t), columns, "table " + str(t), ["bench.sensitive"] if t % 4 == 0 else []
+
+# what collibra holds for the same assets: about every tenth description and tag list differs from okera, so the diff has work to do
+def collibra_assets(scale, databases = 1):
+    for db, table, columns, comment, tags in tables(scale, databases):
+        tab_name = db + "." + table
+        t = int(table.split("_")[1])
+        yield {'name': tab_name, 'type': "Table", 'description': comment if t % 10 else "changed " + comment, 'tags': tags}
+        for name, type_id, col_comment, col_tags in columns:
+            c = int(name.split("_")[1])
+            yield {'name': tab_name + "." + name, 'type': "Column", 'description': col_comment if (t + c) % 10 else "changed", 'tags': col_tags if (t + c) % 10 else ["bench.changed"]}
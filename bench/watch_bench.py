@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+repo = os.path.dirname(bench_dir)
+
+# cost of the watch.py polls against bench/stub_collibra.py and the fake okera context, per catalog size
+# baseline: the first poll without a watermark (a full export.py run), idle: a poll with no collibra change, changes: a poll after --changes steward edits
+# idle and changes polls should cost the same at every scale, only the baseline grows with the catalog
+# the watermark is kept in the bench_sync_state collection of the local collibra_ids database (mongodb has to run locally as for bench/run_bench.py)
+# usage: python bench/watch_bench.py [--scales 2000 20000] [--changes 10] [--latency 0.0]
+
+def delta(after, before):
+    return dict((k, v - before.get(k, 0)) for k, v in after.items() if v != before.get(k, 0))
+
+# one scale, run in its own process since the fake okera catalog is sized when it is imported
+def child(scale, changes, latency):
+    sys.path.insert(0, bench_dir)
+    sys.path.insert(0, os.path.join(bench_dir, "fake_okera"))
+    sys.path.insert(1, repo)
+    from stub_collibra import StubCollibra
+    import config
+    stub = StubCollibra(scale, latency = latency).start()
+    config.configs.update({'collibra dgc': stub.url, 'harvest snapshot': None, 'sync dry run': False, 'sync databases': ["okera_sample"]})
+    import okera
+    import components
+    from okera_writer import OkeraWriter
+    from watch import Watcher
+    state = components.database().bench_sync_state
+    state.drop()
+    ctx = components.okera()
+    writer = OkeraWriter(ctx, None, None, config.configs.get('okera workers', 4))
+    watcher = Watcher(ctx, writer, state)
+    record = {'scale': scale, 'assets': len(stub.assets), 'changes': changes, 'latency': latency}
+
+    def measured_poll():
+        requests, calls = dict(stub.requests), dict(okera.calls)
+        start = time.perf_counter()
+        watcher.poll()
+        return {'seconds': round(time.perf_counter() - start, 3), 'collibra requests': delta(stub.requests, requests), 'okera calls': delta(okera.calls, calls)}
+
+    try:
+        record['baseline'] = measured_poll()
+        record['idle'] = measured_poll()
+        columns = [a.get('name') for a in stub.assets if a.get('type').get('name') == "Column"]
+        for i, name in enumerate(columns[:changes]):
+            stub.modify(name, description = "edited " + str(i), tags = ["bench.edited"])
+        record['changes poll'] = measured_poll()
+        record['sync'] = watcher.stats()
+    finally:
+        writer.close()
+        stub.stop()
+    return record
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", type = int, nargs = "+", default = [2000, 20000])
+    parser.add_argument("--changes", type = int, default = 10)
+    parser.add_argument("--latency", type = float, default = 0.0, help = "seconds added to every stub collibra request")
+    parser.add_argument("--child", type = int, help = argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        # the full export of the baseline prints its own report, only the record goes to stdout's last line
+        print(json.dumps(child(args.child, args.changes, args.latency)))
+        sys.exit(0)
+    for scale in args.scales:
+        env = dict(os.environ, BENCH_SCALE = str(scale))
+        process = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(scale), "--changes", str(args.changes), "--latency", str(args.latency)], env = env, capture_output = True, text = True)
+        if process.returncode:
+            print(process.stderr[-2000:])
+            sys.exit(process.returncode)
+        print(json.dumps(json.loads(process.stdout.strip().splitlines()[-1]), indent = 1))
@@ -0,0 +1,89 @@
+import collections
+import sys
+
+# compact record of one collibra asset, slotted so it has no per-instance dict
+# type, domain and status are interned and tags are shared tuples, so repeated values are stored once per catalog
+# display_name is None when it is just the last part of the name (the usual case for okera tables and columns)
+class Asset:
+    __slots__ = ('name', 'display_name', 'description', 'type', 'domain', 'status', 'tags')
+
+    fields = {'name': 'name', 'description': 'description', 'type': 'type', 'domain': 'domain', 'status': 'status', 'tags': 'tags'}
+
+    def __init__(self, name, display_name, description, type, domain, status, tags):
+        self.name = name
+        self.display_name = display_name
+        self.description = description
+        self.type = type
+        self.domain = domain
+        self.status = status
+        self.tags = tags
+
+    # dict style access with the keys of the asset dicts export.py builds, e.g. asset.get('display name')
+    def get(self, key, default = None):
+        if key == 'display name':
+            return self.display_name if self.display_name is not None else self.name.rsplit(".", 1)[-1]
+        attribute = self.fields.get(key)
+        if attribute is None:
+            return default
+        value = getattr(self, attribute)
+        return default if value is None else value
+
+# indexed view of the collibra assets of a community
+# assets are keyed by their full name (db.table or db.table.column), with secondary indexes by domain and type
+# built once per run so every table and column lookup in the sync loop is a dict lookup instead of a list scan
+# assets are kept as compact Asset records, see bench/catalog_memory.py for the memory per asset
+class Catalog:
+    def __init__(self, assets = None):
+        self.by_name = {}
+        self.domains = collections.defaultdict(list)
+        self.types = collections.defaultdict(list)
+        self.tag_tuples = {}
+        if assets:
+            for asset in assets:
+                self.add(asset)
+
+    # one tuple per distinct tag list, assets with the same tags share it
+    def shared_tags(self, tags):
+        if not tags:
+            return None
+        key = tuple(tags)
+        return self.tag_tuples.setdefault(key, key)
+
+    # adds an asset dict (as built from the /assets results) to all indexes
+    # like the old find_info scan, the first asset with a given name wins the name lookup
+    def add(self, asset):
+        name = asset.get('name')
+        display_name = asset.get('display name')
+        if display_name == name.rsplit(".", 1)[-1]:
+            display_name = None
+        record = Asset(name, display_name, asset.get('description'), intern(asset.get('type')), intern(asset.get('domain')), intern(asset.get('status')), self.shared_tags(asset.get('tags')))
+        self.by_name.setdefault(name, record)
+        self.domains[record.domain].append(record)
+        self.types[record.type].append(record)
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    # returns a single field of an asset, None if the asset is unknown
+    def info(self, name, info):
+        asset = self.by_name.get(name)
+        if asset:
+            return asset.get(info)
+
+    def in_domain(self, domain):
+        return self.domains.get(domain, [])
+
+    def of_type(self, type):
+        return self.types.get(type, [])
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def __len__(self):
+        return len(self.by_name)
+
+    def __iter__(self):
+        return iter(self.by_name.values())
+
+def intern(value):
+    return sys.intern(value) if value is not None else None
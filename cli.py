@@ -0,0 +1,58 @@
+import argparse
+import sys
+import time
+import metrics
+
+# single entry point for the steps of the integration: python cli.py generate | export | watch | seed | serve
+# every command only imports the modules it needs, clients and connections are created on first use (see components.py)
+
+started = time.monotonic()
+
+def generate(args):
+    import generate
+    generate.run()
+
+def export(args):
+    import export
+    export.run(dry_run = args.dry_run or None, resume = args.resume or None)
+
+def watch(args):
+    import watch
+    watch.run(once = args.once, interval = args.interval)
+
+def seed(args):
+    import db
+    db.seed(force = args.force)
+
+def serve(args):
+    import app
+    app.serve(args.port)
+
+def parser():
+    parser = argparse.ArgumentParser(prog = "cli.py", description = "okera to collibra integration")
+    commands = parser.add_subparsers(dest = "command", required = True)
+    commands.add_parser("generate", help = "harvest okera and write integration.json (or its shards)").set_defaults(run = generate)
+    command = commands.add_parser("export", help = "plan and apply collibra tags and descriptions to okera")
+    command.add_argument("--dry-run", action = "store_true", help = "only print the change plan ('sync dry run')")
+    command.add_argument("--resume", action = "store_true", help = "apply the rest of the saved change plan ('sync resume')")
+    command.set_defaults(run = export)
+    command = commands.add_parser("watch", help = "keep okera in sync with the collibra changes since the last poll")
+    command.add_argument("--once", action = "store_true", help = "poll a single time and exit")
+    command.add_argument("--interval", type = float, help = "seconds between polls ('sync poll interval')")
+    command.set_defaults(run = watch)
+    command = commands.add_parser("seed", help = "seed the reference data of the collibra_ids mongodb database")
+    command.add_argument("--force", action = "store_true", help = "reseed even if the stored version is current")
+    command.set_defaults(run = seed)
+    command = commands.add_parser("serve", help = "run the flask app")
+    command.add_argument("--port", type = int, help = "port to listen on ('serve port')")
+    command.set_defaults(run = serve)
+    return parser
+
+def main(argv = None):
+    args = parser().parse_args(argv)
+    # time from loading cli.py until the command is dispatched, bench/startup_bench.py measures the full cold start
+    metrics.observe("cli.startup", time.monotonic() - started)
+    args.run(args)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,284 @@
+import json
+import queue
+import threading
+import time
+import requests
+from requests.auth import AuthBase
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from config import configs
+import metrics
+from backend import Backend
+from json_reader import iter_array
+
+# shared collibra client layer for json-gen.py, export.py and app.py
+# all REST calls go through one keep-alive session so connections and auth are reused instead of reopened per call
+
+DESCRIPTION_TYPE_ID = "00000000-0000-0000-0000-000000003114"
+
+workers = configs.get('collibra workers', 16)
+
+def url(path):
+    return configs.get('collibra dgc') + "/rest/2.0" + path
+
+# logs in once through /auth/sessions and signs every request with the session cookie and CSRF token instead of basic auth
+# the session is shared by all threads, renewed 'collibra session refresh' seconds before 'collibra session ttl' runs out
+# and renewed once more if collibra answers 401 anyway (e.g. after a server restart)
+class SessionAuth(AuthBase):
+    def __init__(self, username, password, ttl = None, refresh = None):
+        self.username = username
+        self.password = password
+        self.ttl = ttl or configs.get('collibra session ttl', 1800)
+        self.refresh = refresh if refresh is not None else configs.get('collibra session refresh', 120)
+        self.lock = threading.Lock()
+        self.cookies = None
+        self.csrf = None
+        self.expires = 0
+        self.logins = 0
+        self.requests = 0
+
+    def login(self):
+        with metrics.timer("collibra.auth"):
+            response = session.post(url("/auth/sessions"), json = {'username': self.username, 'password': self.password}, auth = no_auth)
+        response.raise_for_status()
+        self.cookies = "; ".join(k + "=" + v for k, v in response.cookies.items())
+        self.csrf = json.loads(response.content).get('csrfToken')
+        self.expires = time.monotonic() + self.ttl
+        self.logins += 1
+        return json.loads(response.content)
+
+    # returns the current cookie and CSRF token, logging in first if there is no session or it is about to expire
+    def token(self, stale = None):
+        with self.lock:
+            if self.cookies is None or self.cookies == stale or time.monotonic() > self.expires - self.refresh:
+                self.login()
+            self.requests += 1
+            return self.cookies, self.csrf
+
+    def sign(self, r, cookies, csrf):
+        r.headers['Cookie'] = cookies
+        if csrf:
+            r.headers['X-CSRF-TOKEN'] = csrf
+
+    def __call__(self, r):
+        cookies, csrf = self.token()
+        self.sign(r, cookies, csrf)
+        r.register_hook('response', self.handle_401)
+        return r
+
+    # resends a request once with a fresh session, streamed bodies (generators) can't be replayed and are returned as they are
+    def handle_401(self, r, **kwargs):
+        if r.status_code != 401 or getattr(r.request, 'session_retry', False) or not (r.request.body is None or isinstance(r.request.body, (bytes, str))):
+            return r
+        r.content
+        r.close()
+        prep = r.request.copy()
+        cookies, csrf = self.token(stale = prep.headers.get('Cookie'))
+        self.sign(prep, cookies, csrf)
+        prep.session_retry = True
+        retry = r.connection.send(prep, **kwargs)
+        retry.history.append(r)
+        retry.request = prep
+        return retry
+
+    # every signed request after the first login reused the session instead of authenticating again
+    def stats(self):
+        return {'logins': self.logins, 'requests': self.requests, 'auth round trips saved': self.requests - self.logins}
+
+# the login request itself is sent unsigned
+def no_auth(r):
+    return r
+
+# collibra answers 429 or 503 when it is overloaded, other 5xx responses, dropped connections and timeouts are failures
+class CollibraBackend(Backend):
+    def result_outcome(self, response):
+        if response.status_code in (429, 503):
+            return "throttled"
+        if response.status_code in (500, 502, 504):
+            return "failed"
+        return None
+
+    def error_outcome(self, error):
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return "failed"
+        return None
+
+    def discard(self, response):
+        response.close()
+
+backend = CollibraBackend("collibra", configs.get('collibra backend'))
+timeout = tuple(configs.get('collibra timeout') or (10, 300))
+# POSTs that only read (or log in) are as safe to resend as a GET
+read_only = ("/auth/sessions", "/outputModule/export/json")
+
+# sends every request of the shared session through the collibra backend: adaptive concurrency, retries and circuit breaker (see backend.py)
+# requests without an explicit timeout get 'collibra timeout' (connect, read), streamed upload bodies are never resent
+class BackendAdapter(HTTPAdapter):
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = timeout
+        idempotent = request.method in ("GET", "HEAD", "OPTIONS") or urlparse(request.url).path.endswith(read_only)
+        replayable = request.body is None or isinstance(request.body, (bytes, str))
+        return backend.call(lambda: HTTPAdapter.send(self, request, **kwargs), idempotent = idempotent, replayable = replayable, watch_latency = replayable)
+
+session = requests.Session()
+# 'collibra auth' basic keeps the old per-request basic auth
+if configs.get('collibra auth', "session") == "basic":
+    auth = None
+    session.auth = (configs.get('collibra username'), configs.get('collibra password'))
+else:
+    auth = SessionAuth(configs.get('collibra username'), configs.get('collibra password'))
+    session.auth = auth
+# pool is sized to the fan-out so every worker thread keeps its own connection alive
+adapter = BackendAdapter(pool_connections=1, pool_maxsize=workers)
+session.mount("https://", adapter)
+session.mount("http://", adapter)
+
+def auth_stats():
+    return auth.stats() if auth else {'logins': 0, 'requests': 0, 'auth round trips saved': 0}
+
+# makes a GET call against the collibra REST API and returns the decoded JSON
+# timed as collibra.<first path segment>, e.g. collibra.assets or collibra.tags
+# a server error that is left after the retries raises instead of being read as data
+def get(path, params = None):
+    with metrics.timer("collibra." + path.strip("/").split("/")[0]):
+        response = session.get(url(path), params = params)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return json.loads(response.content)
+
+# generator over a paged collibra list endpoint (e.g. /assets), yields one page of results at a time
+# a background thread fetches up to prefetch pages ahead using offset/limit, so the next request overlaps with processing the current page
+def iter_pages(path, params = None, page_size = None, prefetch = None):
+    page_size = page_size or configs.get('collibra page size', 1000)
+    pages = queue.Queue(maxsize = max(1, prefetch or configs.get('collibra prefetch', 2)))
+    stop = threading.Event()
+
+    # blocks while the queue is full, gives up once the consumer has stopped iterating
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout = 0.1)
+                return
+            except queue.Full:
+                pass
+
+    def fetch():
+        offset = 0
+        try:
+            while not stop.is_set():
+                page_params = dict(params or {})
+                page_params.update({'offset': offset, 'limit': page_size})
+                data = get(path, params = page_params)
+                results = data.get('results') or []
+                if results:
+                    put(results)
+                offset += len(results)
+                # the server may cap limit below page_size, so a short page only ends the list when there is no total to go by
+                total = data.get('total')
+                if not results or (offset >= total if total is not None else len(results) < page_size):
+                    break
+        except Exception as e:
+            put(e)
+        put(None)
+
+    threading.Thread(target = fetch, daemon = True).start()
+    try:
+        while True:
+            page = pages.get()
+            if page is None:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+
+# same as iter_pages but yields the results one by one
+def iter_assets(params = None, page_size = None, prefetch = None):
+    for page in iter_pages("/assets", params, page_size, prefetch):
+        for asset in page:
+            yield asset
+
+# makes /communities REST call, returns the id of the community with the given name
+def get_community_id(name):
+    return get("/communities", params = {'name': name}).get('results')[0].get('id')
+
+# makes /tags/asset/{asset id} REST call
+def get_tags(asset_id):
+    data = get("/tags/asset/" + asset_id)
+    if data:
+        tags = []
+        for t in data:
+            tags.append(t.get('name'))
+        return tags
+
+# makes /attributes REST call for the description attribute of an asset
+def get_attributes(asset_id):
+    params = {
+        'typeId': DESCRIPTION_TYPE_ID,
+        'assetId': asset_id
+        }
+    data = get("/attributes/", params = params)
+    if data.get('results'):
+        return data.get('results')[0].get('value')
+
+# runs fn over items on a bounded thread pool, results come back in the order of items
+def fetch_all(fn, items, max_workers = None):
+    with ThreadPoolExecutor(max_workers = max_workers or workers) as pool:
+        return list(pool.map(fn, items))
+
+# fetches description and tags of every asset id, returns (description, tags) tuples in the order of asset_ids
+def get_details(asset_ids, max_workers = None):
+    return fetch_all(lambda asset_id: (get_attributes(asset_id), get_tags(asset_id)), asset_ids, max_workers)
+
+# output module view of every asset of a community with its description attribute and tags, one row per asset
+# descriptions and tags are groups, i.e. lists of {'description': ...} and {'tag': ...} inside the row
+def asset_view(community_id):
+    return {'TableViewConfig': {
+        'Resources': {'Asset': {
+            'Id': {'name': 'id'},
+            'FullName': {'name': 'name'},
+            'DisplayName': {'name': 'displayName'},
+            'AssetType': {'Name': {'name': 'type'}},
+            'Status': {'Signifier': {'name': 'status'}},
+            'Domain': {'Name': {'name': 'domain'}, 'Community': {'Id': {'name': 'communityId'}}},
+            'StringAttribute': [{'labelId': DESCRIPTION_TYPE_ID, 'LongExpression': {'name': 'description'}}],
+            'Tag': [{'Name': {'name': 'tag'}}],
+            'Filter': {'AND': [{'Field': {'name': 'communityId', 'operator': "EQUALS", 'value': community_id}}]}
+            }},
+        'Columns': [
+            {'Column': {'fieldName': 'id'}},
+            {'Column': {'fieldName': 'name'}},
+            {'Column': {'fieldName': 'displayName'}},
+            {'Column': {'fieldName': 'type'}},
+            {'Column': {'fieldName': 'status'}},
+            {'Column': {'fieldName': 'domain'}},
+            {'Group': {'name': 'descriptions', 'Columns': [{'Column': {'fieldName': 'description'}}]}},
+            {'Group': {'name': 'tags', 'Columns': [{'Column': {'fieldName': 'tag'}}]}}
+            ]
+        }}
+
+# posts a view to the output module and yields the rows of the result table while the response streams in
+# file reads a recorded response from disk instead, e.g. one saved with bench/stub_collibra.py --record
+# timed as collibra.outputModule up to the response headers, the transfer itself overlaps with the caller's processing
+def iter_output_module(view, file = None, chunk_size = 65536):
+    if file:
+        with open(file, "rb") as f:
+            yield from iter_array(iter(lambda: f.read(chunk_size), b""), key = "aaData")
+        return
+    with metrics.timer("collibra.outputModule"):
+        response = session.post(url("/outputModule/export/json"), params = {'validationEnabled': "false"}, json = view, stream = True)
+        response.raise_for_status()
+    with response:
+        yield from iter_array(response.iter_content(chunk_size = chunk_size), key = "aaData")
+
+# every asset of the community with description and tags from one output module request instead of 1 + 2N REST calls
+# yields asset dicts as Catalog.add() takes them, file replays a recorded response (no collibra call at all)
+def export_assets(community = None, file = None):
+    view = None if file else asset_view(get_community_id(community))
+    for row in iter_output_module(view, file):
+        descriptions = [d.get('description') for d in row.get('descriptions') or [] if d.get('description')]
+        tags = [t.get('tag') for t in row.get('tags') or [] if t.get('tag')]
+        yield {'name': row.get('name'), 'display name': row.get('displayName'), 'description': descriptions[0] if descriptions else None, 'type': row.get('type'), 'domain': row.get('domain'), 'status': row.get('status'), 'tags': tags or None}
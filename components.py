@@ -0,0 +1,31 @@
+import functools
+from config import configs
+
+# lazily created objects shared by the commands of cli.py (generate, export, watch, seed, serve)
+# importing a module of this repo never connects anywhere, the first use of one of these does, and only once per process
+# the heavier client libraries (pymongo, pyokera) are only imported here when they are needed
+
+@functools.lru_cache(maxsize = None)
+def mongo():
+    from pymongo import MongoClient
+    return MongoClient(configs.get('mongo uri', "mongodb://localhost:27017/"))
+
+# the collibra_ids database with the reference data, fingerprints and seed versions
+def database():
+    return mongo().collibra_ids
+
+@functools.lru_cache(maxsize = None)
+def okera():
+    from harvest import okera_context
+    return okera_context()
+
+@functools.lru_cache(maxsize = None)
+def community_id():
+    import collibra
+    return collibra.get_community_id(configs.get('community'))
+
+# asset type and relation type ids, loaded once from mongodb
+@functools.lru_cache(maxsize = None)
+def resolver():
+    from resolver import Resolver
+    return Resolver(database())
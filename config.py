@@ -1,5 +1,28 @@
 #tables and columns go in the data dictionary
 #databases and schemas go in the technology asset domain
+#collibra auth session logs in once and reuses the session cookie, basic sends the username and password with every call
+#collibra session ttl is the lifetime in seconds assumed for a collibra session, it is renewed collibra session refresh seconds earlier
+#collibra workers is the number of per-asset collibra calls (tags, descriptions) made in parallel
+#delta export only writes new or changed assets to integration.json, delta deletions also writes removed assets to deletions.json
+#harvest workers is the number of databases listed in parallel, harvest timeout the seconds allowed per database
+#harvest snapshot is the sqlite file the okera harvest is kept in between runs (None harvests everything every run), databases older than harvest max age seconds are harvested again
+#include databases and include tables are glob patterns of the okera databases and tables (db.table) harvested, exclude databases and exclude tables take matches out again
+#shard size splits json-gen.py output into shards of about that many characters in shard directory, None writes one integration.json
+#import jobs in flight is the number of shards app.py imports at once, shard retries the attempts per failed shard
+#upload compression gzip compresses import uploads on the fly, None sends them uncompressed (the default, collibra is not known to decode gzip request bodies, only set gzip once a collibra instance accepted it), upload chunk size is the bytes read from disk at a time
+#job workers is the number of background import jobs app.py runs at once, job history the number of jobs it remembers
+#job timeout is the seconds a collibra import job is followed before it counts as failed
+#okera workers is the number of pooled okera connections, i.e. datasets changed in parallel
+#collibra fetch rest makes export.py read assets page by page plus two calls per asset for description and tags, output module reads them all in one output module request
+#collibra output module file replays a recorded output module response instead of calling collibra, None calls collibra
+#collibra backend and okera backend set how calls are made: concurrency starts at concurrency and adapts between min and max concurrency (cut in half on throttling or calls slower than latency target seconds),
+#failed idempotent calls are retried retries times with jittered backoff (seconds, doubling up to max backoff), breaker failures failed calls in a row stop all calls for breaker reset seconds
+#collibra timeout is the (connect, read) timeout in seconds of every collibra request
+#collibra page size is the number of assets per /assets request, collibra prefetch the number of pages fetched ahead
+#sync databases are glob patterns of the okera databases export.py compares with collibra (None uses include databases), the change plan is saved to sync plan file
+#sync dry run prints the plan and its estimated cost (okera call seconds per change) without changing okera, sync resume applies the rest of the saved plan
+#sync poll interval is the seconds between the polls of cli.py watch, sync page size the assets read per request while looking for changes, sync metrics port serves its /metrics (None serves none)
+#mongo uri is the mongodb server of the collibra_ids database, serve port the port of the flask app started by cli.py serve
 configs = {
  'collibra dgc': "https://okera.collibra.com:443",
  'collibra username': "Admin", 
@@ -9,5 +32,50 @@ configs = {
  'port': 12050, 
  'community': "Okera2.0", 
  'data_dict_domain': {'name': "Okera2.0 Data Dictionary", 'type': "Physical Data Dictionary"}, 
- 'tech_asset_domain': {'name': "Okera2.0 Technology Assets", 'type': "Technology Asset Domain"} 
+ 'tech_asset_domain': {'name': "Okera2.0 Technology Assets", 'type': "Technology Asset Domain"}, 
+ 'collibra auth': "session", 
+ 'collibra session ttl': 1800, 
+ 'collibra session refresh': 120, 
+ 'collibra workers': 16, 
+ 'collibra page size': 1000, 
+ 'collibra prefetch': 2, 
+ 'collibra backend': {'concurrency': 8, 'min concurrency': 1, 'max concurrency': 32, 'latency target': 5.0, 'retries': 4, 'backoff': 0.5, 'max backoff': 30, 'breaker failures': 10, 'breaker reset': 60}, 
+ 'collibra timeout': [10, 300], 
+ 'okera backend': {'concurrency': 4, 'min concurrency': 1, 'max concurrency': 16, 'latency target': None, 'retries': 3, 'backoff': 1, 'max backoff': 30, 'breaker failures': 5, 'breaker reset': 60}, 
+ 'collibra fetch': "rest", 
+ 'collibra output module file': None, 
+ 'okera workers': 4, 
+ 'delta export': False, 
+ 'delta deletions': False, 
+ 'harvest workers': 8, 
+ 'harvest timeout': 300, 
+ 'harvest snapshot': "./okera_snapshot.db", 
+ 'harvest max age': 3600, 
+ 'include databases': ["*"], 
+ 'exclude databases': [], 
+ 'include tables': ["*"], 
+ 'exclude tables': [], 
+ 'shard size': None, 
+ 'shard directory': "./shards", 
+ 'import batch size': 10000, 
+ 'import jobs in flight': 4, 
+ 'shard retries': 2, 
+ 'job poll interval': 2, 
+ 'upload compression': None, 
+ 'upload chunk size': 1048576, 
+ 'job poll max interval': 30, 
+ 'job workers': 2, 
+ 'job history': 100, 
+ 'job max wait': 300, 
+ 'job timeout': 3600, 
+ 'sync databases': ["okera_sample"], 
+ 'sync plan file': "./sync_plan.json", 
+ 'sync dry run': False, 
+ 'sync resume': False, 
+ 'okera call seconds': 0.2, 
+ 'mongo uri': "mongodb://localhost:27017/", 
+ 'serve port': 5000, 
+ 'sync poll interval': 10, 
+ 'sync page size': 100, 
+ 'sync metrics port': None 
  }
@@ -1,13 +1,10 @@
-import pymongo
+import hashlib
+import json
+from pymongo import ASCENDING, UpdateOne
+import components
 
-#MongoDB setup
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-collibra_ids = client["collibra_ids"]
-
-#tables/collections
-relation_ids= collibra_ids["relation_ids"]
-asset_ids = collibra_ids["asset_ids"]
-domain_ids = collibra_ids["domain_ids"]
+#reference data of the collibra_ids MongoDB database (see components.database()), written by seed()
+#tables/collections: domain_ids, asset_ids, relation_ids
 
 domains = [
   { "name": "Business Asset Domain", "id": "00000000-0000-0000-0000-000000030002"},
@@ -181,10 +178,43 @@ relations = [
     { "head": "File Group", "role": "contains", "tail": "Table", "id": "00000000-0000-0000-0001-002600000005"},
 ]
 
-domain_ids.drop()
-asset_ids.drop()
-relation_ids.drop()
+# seeding is versioned: the version is a hash of the reference data above, an unchanged version skips the work
+# each collection is bulk-upserted into a staging collection, indexed there and then renamed over the live one
+# the rename is atomic, readers (json-gen.py, export.py) never see an empty or half-written collection
+seeds = [
+    # collection, reference data, key of a document, unique indexes, other indexes
+    ("domain_ids", domains, ['name'], [[('name', ASCENDING)]], []),
+    ("asset_ids", assets, ['name'], [[('name', ASCENDING)]], []),
+    ("relation_ids", relations, ['id'], [[('id', ASCENDING)]], [[('head', ASCENDING), ('tail', ASCENDING)]]),
+]
+
+def seed_version():
+    data = [(name, documents) for name, documents, key, unique, other in seeds]
+    return hashlib.sha1(json.dumps(data, sort_keys = True).encode("utf-8")).hexdigest()
+
+def seed_collection(collibra_ids, name, documents, key, unique, other, version):
+    staging = collibra_ids[name + "_" + version[:12]]
+    staging.drop()
+    operations = [UpdateOne(dict((k, d.get(k)) for k in key), {'$set': d}, upsert = True) for d in documents]
+    staging.bulk_write(operations, ordered = False)
+    for index in unique:
+        staging.create_index(index, unique = True)
+    for index in other:
+        staging.create_index(index)
+    staging.rename(name, dropTarget = True)
+
+def seed(force = False):
+    collibra_ids = components.database()
+    version = seed_version()
+    current = collibra_ids.seed_versions.find_one({'_id': "reference data"})
+    if not force and current and current.get('version') == version:
+        print("reference data is up to date (version " + version[:12] + ")")
+        return False
+    for name, documents, key, unique, other in seeds:
+        seed_collection(collibra_ids, name, documents, key, unique, other, version)
+    collibra_ids.seed_versions.replace_one({'_id': "reference data"}, {'_id': "reference data", 'version': version}, upsert = True)
+    print("reference data seeded (version " + version[:12] + ")")
+    return True
 
-domain_ids.insert_many(domains)
-asset_ids.insert_many(assets)
-relation_ids.insert_many(relations)
+if __name__ == "__main__":
+    seed()
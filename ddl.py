@@ -0,0 +1,77 @@
+type_ids = ["BOOLEAN", "TINYINT", "SMALLINT", "INT", "BIGINT", "FLOAT", "DOUBLE", "STRING", "VARCHAR", "CHAR", "BINARY", "TIMESTAMP_NANOS", "DECIMAL", "DATE", "RECORD", "ARRAY", "MAP"]
+complex_types = ["RECORD", "ARRAY", "MAP"]
+# okera type names that are spelled differently in DDL
+ddl_types = {"TIMESTAMP_NANOS": "TIMESTAMP"}
+
+# escapes a value for use as a single quoted string literal in okera DDL
+def quote(value):
+    return "'" + (value or "").replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+# renders the DDL type of an okera column, including decimal precision/scale and char/varchar length
+# the okera type name is not always the DDL name (TIMESTAMP_NANOS is declared as TIMESTAMP)
+# nested types (RECORD, ARRAY, MAP) can't be rendered from the type id alone, they come back as None
+def column_type(col):
+    name = type_ids[col.type.type_id]
+    if name in complex_types:
+        return None
+    if name == "DECIMAL" and getattr(col.type, 'precision', None) is not None:
+        return "DECIMAL(" + str(col.type.precision) + "," + str(col.type.scale or 0) + ")"
+    if name in ("VARCHAR", "CHAR") and getattr(col.type, 'len', None):
+        return name + "(" + str(col.type.len) + ")"
+    return ddl_types.get(name, name)
+
+# gathers all description changes of one table or view and turns them into as few DDL statements as possible
+# columns is the table's column list as (name, type, comment) tuples in table order, type None for a type that can't be rendered
+# the statements of a table go to okera in one batch (see OkeraWriter)
+class CommentPlan:
+    def __init__(self, name, type, columns):
+        self.name = name
+        self.type = type
+        self.columns = [(c[0], c[1]) for c in columns]
+        # comments okera has now, re-sent unchanged by REPLACE COLUMNS
+        self.existing = dict((c[0], c[2]) for c in columns)
+        self.table_comment = None
+        self.table_changed = False
+        self.column_comments = {}
+        # columns whose comment can't be changed because their type can't be re-declared (nested types)
+        self.skipped = []
+
+    def set_table_comment(self, description):
+        self.table_comment = description
+        self.table_changed = True
+
+    def set_column_comment(self, column, description):
+        self.column_comments[column] = description
+
+    def __len__(self):
+        return len(self.column_comments) + (1 if self.table_changed else 0)
+
+    # a single REPLACE COLUMNS re-declares every column, so it is only used on plain tables whose column types all render
+    def can_replace_columns(self):
+        return self.type == "Table" and all(c[1] is not None for c in self.columns)
+
+    def statements(self):
+        statements = []
+        if self.table_changed:
+            statements.append("ALTER " + ("VIEW " if self.type == "View" else "TABLE ") + self.name + " SET TBLPROPERTIES ('comment' = " + quote(self.table_comment) + ")")
+        self.skipped = []
+        if len(self.column_comments) > 1 and self.can_replace_columns():
+            specs = []
+            for name, type in self.columns:
+                if name in self.column_comments:
+                    specs.append(name + " " + type + " COMMENT " + quote(self.column_comments.get(name)))
+                elif self.existing.get(name) is None:
+                    # a column without a comment stays without one
+                    specs.append(name + " " + type)
+                else:
+                    specs.append(name + " " + type + " COMMENT " + quote(self.existing.get(name)))
+            statements.append("ALTER TABLE " + self.name + " REPLACE COLUMNS (" + ", ".join(specs) + ")")
+            return statements
+        # otherwise every changed column gets its own CHANGE statement, columns of a nested type are left alone
+        types = dict(self.columns)
+        for name, description in self.column_comments.items():
+            if types.get(name) is None:
+                self.skipped.append(name)
+                continue
+            statements.append("ALTER TABLE " + self.name + " CHANGE " + name + " " + name + " " + types.get(name) + " COMMENT " + quote(description))
+        return statements
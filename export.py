@@ -1,33 +1,14 @@
-import json
-import requests
-from okera import context
-from pymongo import MongoClient
+import os
 from config import configs
+from catalog import Catalog
+import collibra
+import metrics
+from harvest import cached_harvest, invalidate_snapshot, Scope
+from okera_writer import OkeraWriter
+from plan import Plan, Progress
+from ddl import CommentPlan, column_type
 import collections
-
-client = MongoClient(port=27017)
-db = client.collibra_ids
-
-community = configs.get('community')
-community_id = json.loads(requests.get(configs.get('collibra dgc') + "/rest/2.0/communities", params = {'name': community}, auth = (configs.get('collibra username'), configs.get('collibra password'))).content).get('results')[0].get('id')
-
-# makes /tags/asset/{asset id} REST call
-def get_tags(asset_id):
-    data = json.loads(requests.get(configs.get('collibra dgc') + "/rest/2.0/tags/asset/" + asset_id, auth = (configs.get('collibra username'), configs.get('collibra password'))).content)
-    if data:
-        tags = []
-        for t in data:
-            tags.append(t.get('name'))
-        return tags
-
-def get_attributes(asset_id):
-    params = {
-        'typeId': "00000000-0000-0000-0000-000000003114",
-        'assetId': asset_id
-        }
-    data = json.loads(requests.get(configs.get('collibra dgc') + "/rest/2.0/attributes/", params = params, auth = (configs.get('collibra username'), configs.get('collibra password'))).content)
-    if data.get('results'):
-        return data.get('results')[0].get('value')
+import components
 
 # creates tags as namespace.key, adds them to list
 def create_tags(attribute_values):
@@ -38,102 +19,155 @@ def create_tags(attribute_values):
             attributes.append(name)
         return attributes
 
-# pyokera calls
-ctx = context()
-ctx.enable_token_auth(token_str=configs.get('token'))
-with ctx.connect(host = configs.get('host'), port = configs.get('port')) as conn:
-    databases = conn.list_databases()
-    elements = []
-    #conn.execute_ddl("CREATE EXTERNAL TABLE okera_sample.users_test (uid STRING COMMENT 'Unique user id', dob STRING COMMENT 'Formatted as DD-month-YY', gender STRING, ccn STRING COMMENT 'Sensitive data, should not be accessible without masking.') COMMENT 'Okera sample dataset.' STORED AS PARQUET LOCATION 'file:/opt/data/users'")
-    for database in databases:
-        tables = conn.list_datasets(database)
-        if tables:
-            element = {'database': database, 'tables': tables}
-        else:
-            element = {'database': database}
-        elements.append(element)
-update_elements = []
-type_ids = ["BOOLEAN", "TINYINT", "SMALLINT", "INT", "BIGINT", "FLOAT", "DOUBLE", "STRING", "VARCHAR", "CHAR", "BINARY", "TIMESTAMP_NANOS", "DECIMAL", "DATE", "RECORD", "ARRAY", "MAP"]
-
 # gets assets and their tags from collibra
-params = {
-    'simulation': False,
-    'communityId': community_id
-    }
-data = json.loads(requests.get(configs.get('collibra dgc') + "/rest/2.0/assets", params = params, auth = (configs.get('collibra username'), configs.get('collibra password'))).content)
-for d in data.get('results'):
-    update_elements.append({'name': d.get('name'), 'display name': d.get('displayName'), 'description': get_attributes(d.get('id')), 'type': d.get('type').get('name'), 'domain': d.get('domain').get('name'), 'status': d.get('status').get('name'), 'tags': get_tags(d.get('id'))})
-
-def find_info(name, info):
-    for ue in update_elements:
-        if ue.get('name') == name:
-            return ue.get(info)
-            break
-
-# makes assign_attribute() or unassign_attribute() call for either table or column
-def tag_actions(action, db, name, type, tags):
-    with ctx.connect(host = configs.get('host'), port = configs.get('port')) as conn:
-        for tag in tags:
-            nmspc_key = tag.split(".")
-            if action == "assign":
-                if type == "Column":
-                    tab_col = name.split(".")
-                    conn.assign_attribute(nmspc_key[0], nmspc_key[1], db, dataset=tab_col[1], column=tab_col[2], if_not_exists=True)
-                elif type == "Table":
-                    conn.assign_attribute(nmspc_key[0], nmspc_key[1], db, dataset=name, if_not_exists=True)
-            elif action == "unassign":
-                if type == "Column":
-                    tab_col = name.split(".")
-                    conn.unassign_attribute(nmspc_key[0], nmspc_key[1], db, dataset=tab_col[1], column=tab_col[2], if_not_exists=True)
-                elif type == "Table":
-                    conn.unassign_attribute(nmspc_key[0], nmspc_key[1], db, dataset=name, if_not_exists=True)
+# 'collibra fetch' output module reads everything from one streamed output module request (or the recorded 'collibra output module file')
+# otherwise assets are read page by page, descriptions and tags are fetched concurrently for each page
+# results come back in asset order so the catalog build stays deterministic
+def load_catalog():
+    catalog = Catalog()
+    if configs.get('collibra fetch', "rest") == "output module":
+        for asset in collibra.export_assets(configs.get('community'), configs.get('collibra output module file')):
+            catalog.add(asset)
+        return catalog
+    community_id = components.community_id()
+    params = {
+        'simulation': False,
+        'communityId': community_id
+        }
+    for page in collibra.iter_pages("/assets", params = params):
+        details = collibra.get_details([d.get('id') for d in page])
+        for d, (description, tags) in zip(page, details):
+            catalog.add({'name': d.get('name'), 'display name': d.get('displayName'), 'description': description, 'type': d.get('type').get('name'), 'domain': d.get('domain').get('name'), 'status': d.get('status').get('name'), 'tags': tags})
+    return catalog
 
-# alters description for either table, view or column
-def desc_actions(name, type, col_type, description):
-    with ctx.connect(host = configs.get('host'), port = configs.get('port')) as conn:
+# queues assign_attribute() or unassign_attribute() changes for either table or column
+def tag_actions(plan, action, db, name, type, tags):
+    for tag in tags:
+        nmspc_key = tag.split(".")
         if type == "Column":
-            tab_col = name.rsplit('.', 1)
-            conn.execute_ddl("ALTER TABLE " + tab_col[0] + " CHANGE " + tab_col[1] + " " + tab_col[1] + " " + col_type + " COMMENT '" + description + "'")
+            tab_col = name.split(".")
+            dataset, column = tab_col[1], tab_col[2]
         elif type == "Table":
-            conn.execute_ddl("ALTER TABLE " + name + " SET TBLPROPERTIES ('comment' = '" + description + "')")
-        elif type == "View":
-            conn.execute_ddl("ALTER VIEW " + name + " SET TBLPROPERTIES ('comment' = '" + description + "')")
+            dataset, column = name, None
+        if action == "assign":
+            plan.assign(db, dataset, nmspc_key[0], nmspc_key[1], column = column)
+        elif action == "unassign":
+            plan.unassign(db, dataset, nmspc_key[0], nmspc_key[1], column = column)
+
+# queues the DDL of all description changes (table or view comment and column comments) of one table
+def desc_actions(plan, db, table, comments):
+    for ddl in comments.statements():
+        plan.execute_ddl(db, table, ddl)
+    for column in comments.skipped:
+        print("not changing the comment of " + db + "." + table + "." + column + ", its nested type can't be re-declared")
 
-for element in elements:
-    if element.get('database') == "okera_sample":
+# planning phase: compares collibra and okera and records every needed change in a Plan, nothing is changed in okera
+# find_info is a constant time lookup in the indexed catalog
+# with partial = True the catalog only holds some assets (e.g. the changed ones of watch.py), tables and columns missing from it are left alone
+def plan_changes(catalog, elements, partial = False):
+    plan = Plan()
+    find_info = catalog.info
+    for element in elements:
+        if element.get('error'):
+            print("skipping database " + element.get('database') + ": " + element.get('error'))
+            continue
         # begin of table loop: iterates over tables compares tags and descriptions from collibra and okera
         # tags: if only okera tags exist -> unassign tags in okera, if only collibra tags exist -> assign tags in okera, if collibra and okera tags exist -> compare tags and change (unassign and assign) if the collibra tags are different to the okera tags
-        for t in element.get('tables'):
+        for t in element.get('tables') or []:
             tab_name = t.db[0] + "." + t.name
-            collibra_tab_tags = find_info(tab_name, "tags")
-            okera_tab_tags = create_tags(t.attribute_values)
-            if okera_tab_tags and collibra_tab_tags:
-                if collections.Counter(okera_tab_tags) != collections.Counter(collibra_tab_tags):
-                    tag_actions("unassign", t.db[0], t.name, "Table", okera_tab_tags)
-                    tag_actions("assign", t.db[0], t.name, "Table", collibra_tab_tags)
-            elif collibra_tab_tags and not okera_tab_tags:
-                tag_actions("assign", t.db[0], t.name, "Table", collibra_tab_tags)
-            elif okera_tab_tags and not collibra_tab_tags:
-                tag_actions("unassign", t.db[0], t.name, "Table", okera_tab_tags)
-            collibra_tab_desc = find_info(tab_name, "description")
-            okera_tab_desc = t.description
             type = "View" if t.primary_storage == "VIEW" else "Table"
-            if okera_tab_desc and not collibra_tab_desc or collibra_tab_desc and not okera_tab_desc or (okera_tab_desc and collibra_tab_desc and okera_tab_desc != collibra_tab_desc):
-                desc_actions(tab_name, type, None, collibra_tab_desc)        
+            # description changes of the table and its columns are collected and sent as few DDL statements as possible
+            comments = CommentPlan(tab_name, type, [(col.name, column_type(col), col.comment) for col in t.schema.cols])
+            if not partial or tab_name in catalog:
+                collibra_tab_tags = find_info(tab_name, "tags")
+                okera_tab_tags = create_tags(t.attribute_values)
+                if okera_tab_tags and collibra_tab_tags:
+                    if collections.Counter(okera_tab_tags) != collections.Counter(collibra_tab_tags):
+                        tag_actions(plan, "unassign", t.db[0], t.name, "Table", okera_tab_tags)
+                        tag_actions(plan, "assign", t.db[0], t.name, "Table", collibra_tab_tags)
+                elif collibra_tab_tags and not okera_tab_tags:
+                    tag_actions(plan, "assign", t.db[0], t.name, "Table", collibra_tab_tags)
+                elif okera_tab_tags and not collibra_tab_tags:
+                    tag_actions(plan, "unassign", t.db[0], t.name, "Table", okera_tab_tags)
+                collibra_tab_desc = find_info(tab_name, "description")
+                okera_tab_desc = t.description
+                if okera_tab_desc and not collibra_tab_desc or collibra_tab_desc and not okera_tab_desc or (okera_tab_desc and collibra_tab_desc and okera_tab_desc != collibra_tab_desc):
+                    comments.set_table_comment(collibra_tab_desc)
             # begin of column loop: same functionality as table loop
             for col in t.schema.cols:
                 col_name = tab_name + "." + col.name
+                if partial and col_name not in catalog:
+                    continue
                 collibra_col_tags = find_info(col_name, "tags")
                 okera_col_tags = create_tags(col.attribute_values)
                 if okera_col_tags and collibra_col_tags:
                     if collections.Counter(okera_col_tags) != collections.Counter(collibra_col_tags):
-                        tag_actions("unassign", t.db[0], col_name, "Column", okera_col_tags)
-                        tag_actions("assign", t.db[0], col_name, "Column", collibra_col_tags)
+                        tag_actions(plan, "unassign", t.db[0], col_name, "Column", okera_col_tags)
+                        tag_actions(plan, "assign", t.db[0], col_name, "Column", collibra_col_tags)
                 elif collibra_col_tags and not okera_col_tags:
-                    tag_actions("assign", t.db[0], col_name, "Column", collibra_col_tags)
+                    tag_actions(plan, "assign", t.db[0], col_name, "Column", collibra_col_tags)
                 elif okera_col_tags and not collibra_col_tags:
-                    tag_actions("unassign", t.db[0], col_name, "Column", okera_col_tags)
+                    tag_actions(plan, "unassign", t.db[0], col_name, "Column", okera_col_tags)
                 collibra_col_desc = find_info(col_name, "description")
                 okera_col_desc = col.comment
                 if okera_col_desc and not collibra_col_desc or collibra_col_desc and not okera_col_desc or (okera_col_desc and collibra_col_desc and okera_col_desc != collibra_col_desc):
-                    desc_actions(col_name, "Column", type_ids[col.type.type_id], collibra_col_desc)
\ No newline at end of file
+                    comments.set_column_comment(col.name, collibra_col_desc)
+            if comments:
+                desc_actions(plan, t.db[0], t.name, comments)
+
+    return plan
+
+# compares collibra and okera and applies the changes, dry_run and resume default to 'sync dry run' and 'sync resume'
+# returns True once the whole plan is applied, or for a dry run once it is planned and saved
+# pyokera calls, datasets of the selected databases are listed in parallel and consumed as they arrive
+# databases harvested by an earlier run within 'harvest max age' come from the harvest snapshot
+def run(dry_run = None, resume = None):
+    dry_run = configs.get('sync dry run', False) if dry_run is None else dry_run
+    ctx = components.okera()
+    # 'sync databases' takes the place of 'include databases' for export.py, the other patterns of config.py still apply
+    scope = Scope(include_databases = configs.get('sync databases'))
+    plan_file = configs.get('sync plan file', "./sync_plan.json")
+    progress_file = plan_file + ".progress"
+    resume = (configs.get('sync resume', False) if resume is None else resume) and os.path.exists(plan_file)
+
+    if resume:
+        plan = Plan.load(plan_file)
+        print("resuming plan " + plan.id + " from " + plan_file)
+    else:
+        with metrics.timer("export.plan"):
+            plan = plan_changes(load_catalog(), cached_harvest(ctx, scope = scope))
+        plan.save(plan_file)
+
+    workers = configs.get('okera workers', 4)
+    print(plan.describe(workers, configs.get('okera call seconds', 0.2), changes = dry_run))
+
+    # apply phase: databases in parallel, datasets of one database in plan order
+    # progress is kept next to the plan file, after a failure the run can be repeated with 'sync resume' to apply only the rest
+    if dry_run:
+        print("dry run, nothing applied to okera (plan saved to " + plan_file + ")")
+        failed = []
+    else:
+        progress = Progress(progress_file, plan.id, resume)
+        writer = OkeraWriter(ctx, configs.get('host'), configs.get('port'), workers)
+        with metrics.timer("export.apply"):
+            results = writer.apply_plan(plan, progress)
+        writer.close()
+        progress.close()
+        # changed databases are harvested again by the next run instead of being read from the snapshot
+        invalidate_snapshot([db for db, r in results.items() if r.get('calls')])
+        for (db, dataset), (calls, seconds) in writer.timings.items():
+            print(db + "." + dataset + ": " + str(calls) + " okera calls in " + str(round(seconds, 3)) + "s")
+        skipped = len(progress.done) - sum(r.get('datasets') for r in results.values())
+        if resume and skipped:
+            print(str(skipped) + " datasets already applied by an earlier run")
+        failed = [db for db, r in results.items() if r.get('error')]
+        for db in failed:
+            print("database " + db + " stopped: " + results[db].get('error'))
+        if failed:
+            print("run again with --resume (or 'sync resume') to apply the rest of plan " + plan.id)
+    print(collibra.auth_stats())
+    print(metrics.summary())
+    return failed == []
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,110 @@
+import contextlib
+import hashlib
+import json
+import time
+from pymongo import UpdateOne
+from config import configs
+import metrics
+
+# content fingerprints of the assets written to integration.json, stored in the collibra_ids mongodb database
+# a delta run compares every asset against the fingerprint of the previous run and only exports new or changed assets
+# the fingerprints of a run are first kept as pending (fingerprints_pending) and only replace the stored ones once collibra imported the output (see commit_pending)
+# pending fingerprints carry the generation id of the output they belong to, an import only commits the ones of the output it imported
+class FingerprintStore:
+    def __init__(self, collection, pending = None):
+        self.collection = collection
+        self.pending = pending
+        # one query at start-up instead of one per asset
+        with metrics.timer("mongo.fingerprints_load"):
+            self.stored = dict((f.get('_id'), f.get('fingerprint')) for f in collection.find({}, {'fingerprint': 1}))
+        self.seen = set()
+        self.updates = {}
+        self.hits = 0
+        self.new = 0
+        self.changed_count = 0
+
+    @staticmethod
+    def key(asset):
+        return asset.get('domain') + "/" + asset.get('name')
+
+    # hash over everything that ends up in the asset's json object
+    @staticmethod
+    def fingerprint(asset):
+        content = [asset.get('name'), asset.get('display name'), asset.get('domain'), asset.get('type id'), asset.get('status'), asset.get('description') or "", sorted(asset.get('tags') or []), asset.get('relations')]
+        return hashlib.sha1(json.dumps(content, sort_keys = True).encode("utf-8")).hexdigest()
+
+    # returns True if the asset is new or differs from the last stored run
+    def changed(self, asset):
+        key = self.key(asset)
+        fingerprint = self.fingerprint(asset)
+        self.seen.add(key)
+        old = self.stored.get(key)
+        if old == fingerprint:
+            self.hits += 1
+            return False
+        if old is None:
+            self.new += 1
+        else:
+            self.changed_count += 1
+        self.updates[key] = {'_id': key, 'name': asset.get('name'), 'domain': asset.get('domain'), 'fingerprint': fingerprint}
+        return True
+
+    # assets stored by an earlier run that were not seen in this one, as collibra identifiers (name, domain)
+    def deleted(self):
+        deleted = []
+        for key in self.stored:
+            if key not in self.seen:
+                domain, name = key.split("/", 1)
+                deleted.append({'name': name, 'domain': domain})
+        return deleted
+
+    # keeps the fingerprints of this run as the pending set of generation, replacing the one of an earlier run that was never imported
+    # with remove_deleted, assets not seen in this run are dropped from the stored fingerprints on commit
+    def save_pending(self, generation, remove_deleted = False):
+        documents = [dict(d, generation = generation) for d in self.updates.values()]
+        if remove_deleted:
+            documents.extend({'_id': key, 'removed': True, 'generation': generation} for key in self.stored if key not in self.seen)
+        with metrics.timer("mongo.fingerprints_save"):
+            self.pending.drop()
+            if documents:
+                self.pending.insert_many(documents, ordered = False)
+
+    def stats(self):
+        total = self.hits + self.new + self.changed_count
+        return {'assets': total, 'unchanged': self.hits, 'new': self.new, 'changed': self.changed_count, 'deleted': len(self.deleted()), 'hit rate': round(self.hits / total, 3) if total else 0.0}
+
+# moves the pending fingerprints of generation into the stored ones, called once collibra imported the output of that generation
+# pending fingerprints of another generation (the output was replaced while it was imported) are left alone
+# returns the number of fingerprints committed
+def commit_pending(database, generation):
+    if not generation:
+        return 0
+    documents = list(database.fingerprints_pending.find({'generation': generation}, {'generation': 0}))
+    operations = [UpdateOne({'_id': d.get('_id')}, {'$set': d}, upsert = True) for d in documents if not d.get('removed')]
+    removed = [d.get('_id') for d in documents if d.get('removed')]
+    with metrics.timer("mongo.fingerprints_save"):
+        if operations:
+            database.fingerprints.bulk_write(operations, ordered = False)
+        if removed:
+            database.fingerprints.delete_many({'_id': {'$in': removed}})
+        database.fingerprints_pending.delete_many({'generation': generation})
+    return len(documents)
+
+# forgets the pending fingerprints, e.g. after an import that is not going to be retried, returns how many there were
+def discard_pending(database):
+    count = database.fingerprints_pending.count_documents({})
+    database.fingerprints_pending.drop()
+    return count
+
+# marks an import of generation as running for as long as the with block runs, generate.run refuses to replace the output meanwhile
+@contextlib.contextmanager
+def importing(database, generation):
+    marker = database.imports.insert_one({'generation': generation, 'started': time.time()}).inserted_id
+    try:
+        yield
+    finally:
+        database.imports.delete_one({'_id': marker})
+
+# number of imports running now, markers older than 'job timeout' seconds were left behind by a stopped app.py and are not counted
+def running_imports(database):
+    return database.imports.count_documents({'started': {'$gte': time.time() - configs.get('job timeout', 3600)}})
@@ -0,0 +1,184 @@
+import uuid
+from config import configs
+import collibra
+import components
+import metrics
+from harvest import cached_harvest, Scope
+from fingerprints import FingerprintStore, discard_pending, running_imports
+from json_writer import JsonArrayWriter, ShardedJsonWriter
+
+# builds integration.json (or its shards) from the okera metadata, formerly the module body of json-gen.py
+
+# creates tags as namespace.key, adds them to list
+def create_tags(attribute_values):
+    attributes = []
+    if attribute_values:
+        for attribute in attribute_values:
+            name = attribute.attribute.attribute_namespace + "." + attribute.attribute.key
+            attributes.append(name)
+        return attributes
+
+# writes the domains, databases, tables and columns of one run to output
+# delta mode only writes assets whose fingerprint changed since the last run, fingerprints are kept in both modes
+class Generator:
+    def __init__(self, output, fingerprints, resolver, delta = False):
+        self.output = output
+        self.fingerprints = fingerprints
+        self.resolver = resolver
+        self.delta = delta
+        self.community = configs.get('community')
+        self.data_dict_domain = configs.get('data_dict_domain')
+        self.tech_asset_domain = configs.get('tech_asset_domain')
+        self.domain_info = [self.data_dict_domain, self.tech_asset_domain]
+
+    # takes domain name (set in config.py) and retrieves its domain id
+    def get_ids(self, name):
+        params = {
+        'name': name,
+        'communityId': components.community_id()}
+        domain_id = collibra.get("/domains", params = params)
+        return domain_id.get('results')[0].get('id')
+
+    # makes /assets REST call
+    def get_assets(self, name, domain_id):
+        params = {
+            'name': name,
+            'nameMatchMode': "EXACT",
+            'simulation': False,
+            'domainId': domain_id,
+            'communityId': components.community_id()
+            }
+        data = collibra.get("/assets", params = params)
+        return data.get('results')[0]
+
+    # finds asset id and name
+    def find_asset_id(self, asset_name):
+        return self.resolver.asset(asset_name)
+
+    # finds relation id and head
+    def find_relation_id(self, head, tail):
+        return self.resolver.relation_id(head, tail)
+
+    # creates relation object for relations between data sets and databases, and data sets and data elements (and vice versa)
+    def create_relation(self, relations):
+        relation_object = {}
+        for r in relations:
+            # example: relation = 00000000-0000-0000-0000-000000007062:TARGET
+            relation = self.resolver.relation(r.get('asset type'), r.get('asset relation'))
+            relation_object.setdefault(relation, []).append({'name': r.get('name'), 'domain': {'name': r.get('domain'), 'community': {'name': self.community}}})
+        return relation_object
+
+    # writes each domain's info as one object to the output
+    def create_domain(self):
+        for d in self.domain_info:
+            self.output.write({'resourceType': "Domain", 'identifier': {'name': d.get('name'), 'community': {'name': self.community}}, 'type': {'name': d.get('type')}}, "domains")
+
+    # writes each asset's info and its relations as one object to the output as soon as it is built
+    # phase is the output phase of the assets, together keeps all of them in one shard
+    def create_asset(self, asset, phase, together = False):
+        written = False
+        for a in asset:
+            if not self.fingerprints.changed(a) and self.delta:
+                continue
+            self.output.write({
+                'resourceType': "Asset",
+                'attributes': {collibra.DESCRIPTION_TYPE_ID: [{'value': a.get('description')}] if a.get('description') else []},
+                'identifier': {'name': a.get('name'), 'domain': {'name': a.get('domain'), 'community': {'name': self.community}}},
+                'displayName': a.get('display name'),
+                'type': {'id': a.get('type id')},
+                'status': {'name': a.get('status')},
+                'relations': a.get('relations'),
+                'tags': a.get('tags') or []
+                }, phase, split = not (together and written))
+            written = True
+
+    # gathers table and column info from Okera, creates relations
+    # relations are created for table -> schema and column -> table
+    def create_data(self, element):
+        tab_info = self.find_asset_id("Table")
+        col_info = self.find_asset_id("Column")
+        data_dict_domain, tech_asset_domain, community = self.data_dict_domain, self.tech_asset_domain, self.community
+        # tables first, then columns, both generated lazily so no per-database lists are built
+        def tables():
+            for t in element.get('tables'):
+                tab_name = t.db[0] + "." + t.name
+                yield {'description': t.description if t.description else "", "name": tab_name, 'domain': data_dict_domain.get('name'), 'community': community, 'display name': t.name, 'type id': tab_info.get('id'), 'status': "Candidate", 'relations': self.create_relation([{'name': "schema." + t.db[0], 'domain': tech_asset_domain.get('name'), 'asset type': tab_info.get('name'), 'asset relation': "Schema"}]), 'tags': create_tags(t.attribute_values)}
+        def columns():
+            for t in element.get('tables'):
+                tab_name = t.db[0] + "." + t.name
+                for col in t.schema.cols:
+                    name = tab_name + "." + col.name
+                    yield {'description': col.comment if col.comment else "", 'name': name, 'domain': data_dict_domain.get('name'), 'community': community, 'display name': col.name, 'type id': col_info.get('id'), 'status': "Candidate", 'relations': self.create_relation([{'name': tab_name, 'domain': data_dict_domain.get('name'), 'asset type': col_info.get('name'), 'asset relation': "Table"}]), 'tags': create_tags(col.attribute_values)}
+        self.create_asset(tables(), "tables")
+        self.create_asset(columns(), "columns")
+
+    # gathers database info from Okera, creates databases and schemas
+    # a schema is created for each database, relations are created for database -> schema
+    def create_database(self, element):
+        databases = []
+        db_info = self.find_asset_id("Database")
+        schema_info = self.find_asset_id("Schema")
+        tech_asset_domain, community = self.tech_asset_domain, self.community
+        db = element.get('database')
+        schema_name = "schema." + db
+        databases.append({'description': "", 'name': db, 'domain': tech_asset_domain.get('name'), 'community': community, 'display name': db, 'type id': db_info.get('id'), 'status': "Candidate", 'relations': self.create_relation([{'name': schema_name, 'domain': tech_asset_domain.get('name'), 'asset type': db_info.get('name'), 'asset relation': "Schema"}])})
+        databases.append({'description': "", 'name': schema_name, 'domain': tech_asset_domain.get('name'), 'community': community, 'display name': schema_name, 'type id': schema_info.get('id'), 'status': "Candidate", 'relations': self.create_relation([{'name': db, 'domain': tech_asset_domain.get('name'), 'asset type': schema_info.get('name'), 'asset relation': "Database"}])})
+        # a database and its schema relate to each other, so they are never split across shards
+        self.create_asset(databases, "databases", together = True)
+
+# one generation run: harvests okera (through the snapshot), writes the output and keeps its fingerprints as pending until app.py imported it
+# the output and the pending fingerprints carry a new generation id, so an import only commits the fingerprints of the output it sent
+# refuses to run while app.py imports the current output, replacing it would drop the files and pending fingerprints of that import
+# pyokera calls, datasets of all databases are listed in parallel and consumed as they arrive
+# databases harvested by an earlier run (of this command or export) within 'harvest max age' come from the harvest snapshot
+def run():
+    delta = configs.get('delta export', False)
+    database = components.database()
+    if running_imports(database):
+        raise RuntimeError("an import of the current output is running, generate again once it finished")
+    generation = uuid.uuid4().hex
+    # the pending fingerprints of an earlier output are dropped before this run replaces that output
+    discard_pending(database)
+    fingerprints = FingerprintStore(database.fingerprints, database.fingerprints_pending)
+    # only databases and tables matching the include/exclude patterns of config.py are harvested
+    scope = Scope()
+    elements = cached_harvest(components.okera(), scope = scope)
+    resolver = components.resolver()
+    # the resolver is shared by the whole process, a reseed since the last run is picked up here (one seed_versions query)
+    resolver.refresh()
+    harvest_errors = []
+    # with a shard size set, the output is split into shards uploaded phase by phase by app.py
+    if configs.get('shard size'):
+        output = ShardedJsonWriter(configs.get('shard directory', './shards'), configs.get('shard size'), ["domains", "databases", "tables", "columns"])
+    else:
+        output = JsonArrayWriter('./integration.json')
+    output.generation = generation
+    generator = Generator(output, fingerprints, resolver, delta)
+    with output:
+        generator.create_domain()
+        for element in elements:
+            if element.get('error'):
+                harvest_errors.append(element)
+                print("skipping database " + element.get('database') + ": " + element.get('error'))
+                continue
+            generator.create_database(element)
+            if element.get('tables'):
+                generator.create_data(element)
+        # a synchronization may only be finalized with every asset in the output, finalize removes the assets missing from it
+        output.complete = not delta and not harvest_errors and scope.everything()
+
+    # assets from earlier runs that no longer exist in okera, written as a list of collibra identifiers
+    # skipped when a database could not be harvested or the harvest is scoped, their assets would otherwise all look deleted
+    deletions_enabled = configs.get('delta deletions', False) and not harvest_errors and scope.everything()
+    if delta and deletions_enabled:
+        with JsonArrayWriter('./deletions.json') as deletions:
+            for d in fingerprints.deleted():
+                deletions.write({'name': d.get('name'), 'domain': {'name': d.get('domain'), 'community': {'name': generator.community}}})
+    fingerprints.save_pending(generation, remove_deleted = deletions_enabled)
+    print(dict(fingerprints.stats(), generation = generation))
+    print({'reference data queries': resolver.queries})
+    print(collibra.auth_stats())
+    print(metrics.summary())
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,170 @@
+import fnmatch
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import configs
+import metrics
+from okera_writer import ConnectionPool, backend
+from snapshot import HarvestSnapshot
+
+# okera metadata harvest shared by json-gen.py and export.py
+# datasets of many databases are listed at once over a small pool of connections
+
+# okera context with token auth from config.py, pyokera is only imported once a context is needed
+def okera_context():
+    from okera import context
+    ctx = context()
+    ctx.enable_token_auth(token_str=configs.get('token'))
+    return ctx
+
+# which databases and tables a run harvests, as glob patterns ('include databases', 'exclude databases', 'include tables', 'exclude tables' in config.py)
+# table patterns match db.table names, a name is in scope if it matches an include pattern and no exclude pattern
+class Scope:
+    def __init__(self, include_databases = None, exclude_databases = None, include_tables = None, exclude_tables = None):
+        self.include_databases = include_databases or configs.get('include databases') or ["*"]
+        self.exclude_databases = exclude_databases or configs.get('exclude databases') or []
+        self.include_tables = include_tables or configs.get('include tables') or ["*"]
+        self.exclude_tables = exclude_tables or configs.get('exclude tables') or []
+
+    @staticmethod
+    def matches(name, include, exclude):
+        return any(fnmatch.fnmatchcase(name, p) for p in include) and not any(fnmatch.fnmatchcase(name, p) for p in exclude)
+
+    def database(self, name):
+        return self.matches(name, self.include_databases, self.exclude_databases)
+
+    def table(self, database, name):
+        return self.matches(database + "." + name, self.include_tables, self.exclude_tables)
+
+    def all_tables(self):
+        return self.include_tables == ["*"] and not self.exclude_tables
+
+    def everything(self):
+        return self.include_databases == ["*"] and not self.exclude_databases and self.all_tables()
+
+    # the included databases when they are plain names, so list_databases() is not needed
+    def named_databases(self):
+        if not any(c in p for p in self.include_databases for c in "*?["):
+            return [d for d in self.include_databases if self.database(d)]
+
+    # identifies the table patterns in the harvest snapshot, None when every table is harvested
+    def tables_key(self):
+        if not self.all_tables():
+            return json.dumps([self.include_tables, self.exclude_tables])
+
+# list_databases() on connection, a pooled connection or a new one that is closed afterwards
+def list_databases(connection):
+    with connection as conn:
+        with metrics.timer("okera.list_databases"):
+            return conn.list_databases()
+
+# generator over {'database': name, 'tables': datasets} elements (no 'tables' key for empty databases)
+# elements are yielded as soon as their database is listed, so the order follows completion, not list_databases()
+# a database that takes longer than timeout seconds is yielded as {'database': name, 'error': "timed out"}, failed calls carry the exception text
+# only databases and tables in scope are fetched, with table patterns the dataset names are listed first and only matching datasets are loaded
+def harvest(ctx, databases = None, workers = None, timeout = None, scope = None):
+    workers = workers or configs.get('harvest workers', 8)
+    timeout = timeout or configs.get('harvest timeout', 300)
+    scope = scope or Scope()
+    pool = ConnectionPool(ctx, configs.get('host'), configs.get('port'), workers)
+    started = {}
+
+    def list_datasets(database):
+        started[database] = time.monotonic()
+        return backend.call(lambda: fetch_datasets(database))
+
+    def fetch_datasets(database):
+        with pool.connection() as conn:
+            if scope.all_tables():
+                with metrics.timer("okera.list_datasets"):
+                    return conn.list_datasets(database)
+            with metrics.timer("okera.list_dataset_names"):
+                names = [n[len(database) + 1:] if n.startswith(database + ".") else n for n in conn.list_dataset_names(database)]
+            selected = [n for n in names if scope.table(database, n)]
+            if len(selected) == len(names):
+                with metrics.timer("okera.list_datasets"):
+                    return conn.list_datasets(database)
+            tables = []
+            for name in selected:
+                with metrics.timer("okera.list_datasets"):
+                    tables.extend(conn.list_datasets(database, name = name))
+            return tables
+
+    executor = ThreadPoolExecutor(max_workers = workers)
+    try:
+        if databases is None:
+            databases = backend.call(lambda: list_databases(pool.connection()))
+        databases = [d for d in databases if scope.database(d)]
+        pending = dict((executor.submit(list_datasets, database), database) for database in databases)
+        while pending:
+            done, _ = wait(pending, timeout = 1, return_when = FIRST_COMPLETED)
+            for future in done:
+                database = pending.pop(future)
+                try:
+                    tables = future.result()
+                except Exception as e:
+                    yield {'database': database, 'error': str(e)}
+                    continue
+                if tables:
+                    yield {'database': database, 'tables': tables}
+                else:
+                    yield {'database': database}
+            # the timeout counts from when a worker picked the database up, not from submission
+            now = time.monotonic()
+            for future, database in list(pending.items()):
+                if database in started and now - started[database] > timeout:
+                    pending.pop(future)
+                    yield {'database': database, 'error': "timed out"}
+    finally:
+        executor.shutdown(wait = False, cancel_futures = True)
+        pool.close()
+
+# harvest through the on-disk snapshot (see snapshot.py), path and max_age default to 'harvest snapshot' and 'harvest max age'
+# databases harvested less than max_age seconds ago are read from the snapshot without any okera call, only stale ones are harvested and stored
+# fresh databases are yielded first, a database that fails to harvest is yielded as an error and keeps its old snapshot for the next run
+# a snapshot taken with other table patterns is not used, one of all tables is filtered to the scope
+def cached_harvest(ctx, databases = None, max_age = None, path = None, scope = None):
+    path = path or configs.get('harvest snapshot')
+    scope = scope or Scope()
+    if databases is None:
+        databases = scope.named_databases()
+    if not path:
+        yield from harvest(ctx, databases, scope = scope)
+        return
+    max_age = configs.get('harvest max age', 3600) if max_age is None else max_age
+    tables_key = scope.tables_key()
+    snapshot = HarvestSnapshot(path)
+    try:
+        if databases is None:
+            databases = snapshot.database_list(max_age)
+            if databases is None:
+                databases = backend.call(lambda: list_databases(ctx.connect(host = configs.get('host'), port = configs.get('port'))))
+                snapshot.save_database_list(databases)
+        stale = []
+        for database in databases:
+            if not scope.database(database):
+                continue
+            if not snapshot.is_fresh(database, max_age, tables_key):
+                stale.append(database)
+                continue
+            with metrics.timer("snapshot.load"):
+                tables = [t for t in snapshot.load(database) if scope.table(database, t.name)]
+            yield {'database': database, 'tables': tables} if tables else {'database': database}
+        if stale:
+            for element in harvest(ctx, stale, scope = scope):
+                if not element.get('error'):
+                    with metrics.timer("snapshot.save"):
+                        snapshot.save(element.get('database'), element.get('tables') or [], tables_key)
+                yield element
+    finally:
+        snapshot.close()
+
+# marks databases as stale in the snapshot, e.g. after export.py changed their tags or comments
+def invalidate_snapshot(databases, path = None):
+    path = path or configs.get('harvest snapshot')
+    if path and databases:
+        snapshot = HarvestSnapshot(path)
+        try:
+            snapshot.invalidate(databases)
+        finally:
+            snapshot.close()
@@ -0,0 +1,117 @@
+import collections
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import configs
+import upload
+import components
+from fingerprints import commit_pending, importing
+
+# local registry of import jobs started through app.py
+# submit() returns straight away with a local job handle, the upload and the polling of the collibra job run on a background worker
+# clients read the job state with get() or block on wait() until the job is finished
+
+finished_states = ["completed", "failed"]
+
+class JobManager:
+    def __init__(self, workers = None, history = None):
+        self.jobs = collections.OrderedDict()
+        self.history = history or configs.get('job history', 100)
+        self.condition = threading.Condition()
+        self.pool = ThreadPoolExecutor(max_workers = workers or configs.get('job workers', 2))
+
+    # queues run(update) on a background worker, returns a copy of the new job
+    # run reports progress through update(**fields) and returns the job result
+    def submit(self, kind, run):
+        job = {'id': uuid.uuid4().hex, 'kind': kind, 'state': "queued", 'submitted': time.time(), 'finished': None, 'progress': None, 'result': None, 'error': None}
+        with self.condition:
+            self.jobs[job.get('id')] = job
+            # only the newest jobs are kept, finished ones are dropped first
+            while len(self.jobs) > self.history:
+                old = next((j for j in self.jobs.values() if j.get('state') in finished_states), None)
+                if old is None:
+                    break
+                del self.jobs[old.get('id')]
+        self.pool.submit(self.run, job.get('id'), run)
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+            self.condition.notify_all()
+
+    def run(self, job_id, run):
+        self.update(job_id, state = "running")
+        try:
+            result = run(lambda **fields: self.update(job_id, **fields))
+            self.update(job_id, state = "completed", result = result, finished = time.time())
+        except Exception as e:
+            self.update(job_id, state = "failed", error = str(e), finished = time.time())
+
+    def get(self, job_id):
+        with self.condition:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self):
+        with self.condition:
+            return [dict(j) for j in self.jobs.values()]
+
+    # long-poll: blocks until the job is finished or timeout seconds passed, returns the job as it is then
+    def wait(self, job_id, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.jobs.get(job_id) is None or self.jobs.get(job_id).get('state') in finished_states, timeout)
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+# job runner that streams one file to an import endpoint and follows the collibra job until it is finished
+# a completed import commits the pending fingerprints of the generation that wrote the file (see fingerprints.commit_pending)
+# while it runs, generate.run refuses to replace the file (see fingerprints.importing)
+def file_import(path, file_path, file_name = None):
+    def run(update):
+        database = components.database()
+        generation = upload.read_generation(file_path)
+        with importing(database, generation):
+            update(stage = "uploading", generation = generation)
+            response, stats = upload.post_file(path, file_path, file_name)
+            response.raise_for_status()
+            collibra_job = json.loads(response.content)
+            update(stage = "importing", collibra_job = collibra_job.get('id'), upload = stats)
+            final = upload.wait_for_job(collibra_job.get('id'), on_progress = lambda j: update(progress = j.get('progressPercentage')))
+            if final.get('state') != "COMPLETED":
+                raise RuntimeError("collibra job " + final.get('id', "") + " ended as " + str(final.get('state')) + ": " + str(final.get('message')))
+            final['fingerprints committed'] = commit_pending(database, generation)
+        return final
+    return run
+
+# job runner for the sharded upload, progress is the percentage of shards already finished
+# the pending fingerprints of the generation in the manifest are committed once every shard is imported
+def shards_import(sync_id = None):
+    def run(update):
+        database = components.database()
+        manifest = upload.read_manifest()
+        generation = manifest.get('generation')
+        total = len(manifest.get('shards'))
+        if not total:
+            raise RuntimeError("the manifest lists no shards, nothing to import")
+        done = []
+        def on_shard(result):
+            done.append(result)
+            update(progress = round(100.0 * len(done) / total, 1))
+        with importing(database, generation):
+            update(generation = generation)
+            if sync_id:
+                result = upload.sync_shards(sync_id, on_shard = on_shard)
+                shards = result.get('shards')
+            else:
+                shards = upload.upload_shards("/import/json-job", on_shard = on_shard)
+                result = {'shards': shards}
+            if not shards or any(r.get('state') != "COMPLETED" for r in shards):
+                raise RuntimeError("shard import failed: " + json.dumps([r for r in shards if r.get('state') != "COMPLETED"]))
+            result['fingerprints committed'] = commit_pending(database, generation)
+        return result
+    return run
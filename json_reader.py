@@ -0,0 +1,81 @@
+import codecs
+import json
+
+# reads a JSON array element by element while its bytes arrive, the counterpart of json_writer.py
+# chunks is any iterable of bytes (e.g. response.iter_content() or a file read in blocks), only the unparsed rest is buffered
+# the array is either the whole document or, if the document is an object, the value of key (e.g. the aaData rows of an output module table)
+
+whitespace = " \t\r\n"
+
+def iter_array(chunks, key = None):
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    state = {'buffer': "", 'pos': 0}
+
+    # appends the next chunk, dropping everything before pos, returns False at the end of the input
+    def more():
+        for chunk in chunks:
+            text = utf8.decode(chunk)
+            if text:
+                state['buffer'] = state['buffer'][state['pos']:] + text
+                state['pos'] = 0
+                return True
+        return False
+
+    # position of the next character that is not whitespace (or one of skip)
+    def next_char(skip = whitespace):
+        while True:
+            buffer, pos = state['buffer'], state['pos']
+            while pos < len(buffer) and buffer[pos] in skip:
+                pos += 1
+            state['pos'] = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not more():
+                raise ValueError("JSON array ended early")
+
+    # decodes the value at pos (waiting for more input while it is incomplete) and moves pos behind it
+    def value():
+        next_char()
+        while True:
+            try:
+                element, end = decoder.raw_decode(state['buffer'], state['pos'])
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+                continue
+            # a number (or true, false, null) is only complete once the character after it has arrived
+            buffer = state['buffer']
+            if not isinstance(element, (dict, list, str)) and (end == len(buffer) or buffer[end] not in whitespace + ",]}") and more():
+                continue
+            break
+        state['pos'] = end
+        return element
+
+    first = next_char()
+    if first == "{":
+        if key is None:
+            raise ValueError("JSON document is an object, not an array")
+        # walks the keys of the top-level object, the values of other keys are decoded and dropped
+        # (a search for the key text would also match it inside an earlier string value)
+        state['pos'] += 1
+        while True:
+            if next_char(whitespace + ",") == "}":
+                raise ValueError("no " + key + " in JSON document")
+            name = value()
+            if next_char() != ":":
+                raise ValueError("bad JSON after " + str(name))
+            state['pos'] += 1
+            if name == key:
+                break
+            value()
+        first = next_char()
+    if first != "[":
+        raise ValueError("JSON array expected")
+    state['pos'] += 1
+
+    while True:
+        if next_char(whitespace + ",") == "]":
+            return
+        yield value()
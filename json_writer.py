@@ -0,0 +1,110 @@
+import json
+import os
+import metrics
+
+# sidecar file of a JSON output, e.g. ./integration.meta.json for ./integration.json
+def meta_path(path):
+    return os.path.splitext(path)[0] + ".meta.json"
+
+# writes a JSON array to disk one element at a time
+# every element is encoded with the json module as soon as it is built, so the document is never held in memory
+# output goes to a temporary file that replaces path on close, a failed run leaves the previous file untouched
+# with a generation id set, it is written to the sidecar file <name>.meta.json next to path on close (see upload.read_generation)
+class JsonArrayWriter:
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.file = open(self.tmp_path, 'w', encoding = "utf-8")
+        self.file.write('[')
+        self.count = 0
+        self.size = 1
+        # only recorded by ShardedJsonWriter, see there
+        self.complete = False
+        self.generation = None
+        self.encoder = json.JSONEncoder(ensure_ascii = False)
+
+    # phase and split are only used by ShardedJsonWriter, a single file keeps everything in write order
+    def write(self, element, phase = None, split = True):
+        with metrics.timer("json.write"):
+            if self.count:
+                self.file.write(', ')
+                self.size += 2
+            for chunk in self.encoder.iterencode(element):
+                self.file.write(chunk)
+                self.size += len(chunk)
+            self.count += 1
+
+    def close(self):
+        self.file.write(']')
+        self.file.flush()
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        if self.generation:
+            with open(meta_path(self.path), 'w') as meta:
+                json.dump({'generation': self.generation}, meta)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.tmp_path)
+
+# writes the integration output as size-bounded shards instead of one file
+# every element belongs to a phase (e.g. domains, databases, tables, columns), shards never mix phases
+# phases are numbered in dependency order, a phase's shards only reference assets of the same or earlier phases
+# manifest.json in the directory lists the shards in upload order
+# complete is set by the generator when the shards hold every asset (no delta, scope or harvest errors), only then may a synchronization be finalized
+# generation is the id of the generation run that wrote the shards, its pending fingerprints are committed once they are imported
+class ShardedJsonWriter:
+    def __init__(self, directory, max_size, phases):
+        self.directory = directory
+        self.max_size = max_size
+        self.phases = phases
+        self.current = {}
+        self.shards = []
+        self.complete = False
+        self.generation = None
+        os.makedirs(directory, exist_ok = True)
+        for name in os.listdir(directory):
+            if name == "manifest.json" or (name.startswith("integration-") and name.endswith(".json")):
+                os.remove(os.path.join(directory, name))
+
+    def open_shard(self, phase):
+        number = len([s for s in self.shards if s.get('phase') == phase]) + 1
+        name = "integration-" + str(self.phases.index(phase) + 1) + "-" + phase + "-" + str(number).zfill(4) + ".json"
+        self.shards.append({'file': name, 'phase': phase})
+        writer = JsonArrayWriter(os.path.join(self.directory, name))
+        self.current[phase] = writer
+        return writer
+
+    # split = False keeps an element in the same shard as the one written before it (e.g. a database and its schema)
+    def write(self, element, phase = None, split = True):
+        writer = self.current.get(phase)
+        if writer is None:
+            writer = self.open_shard(phase)
+        elif split and writer.size >= self.max_size:
+            writer.close()
+            writer = self.open_shard(phase)
+        writer.write(element)
+
+    def close(self):
+        for writer in self.current.values():
+            writer.close()
+        self.current = {}
+        self.shards.sort(key = lambda s: (self.phases.index(s.get('phase')), s.get('file')))
+        with open(os.path.join(self.directory, "manifest.json"), 'w') as manifest:
+            json.dump({'complete': self.complete, 'generation': self.generation, 'shards': self.shards}, manifest, indent = 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for writer in self.current.values():
+                writer.__exit__(exc_type, exc, tb)
@@ -0,0 +1,118 @@
+import bisect
+import contextlib
+import threading
+import time
+
+# lightweight per-operation instrumentation shared by json-gen.py, export.py and app.py
+# every operation type (e.g. collibra.tags, okera.assign_attribute, mongo.asset_ids, json.write) keeps a call count,
+# an error count and a latency histogram; recording is a perf_counter pair and a few additions under one lock
+
+buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(buckets) + 1)
+
+    def observe(self, seconds, error):
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+        self.buckets[bisect.bisect_left(buckets, seconds)] += 1
+
+    # latency below which q (0..1) of the calls finished, read off the bucket bounds
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(buckets[i], self.max) if i < len(buckets) else self.max
+        return self.max
+
+operations = {}
+lock = threading.Lock()
+# counters and gauges kept by other modules (e.g. the backend.py retry and concurrency counters), name -> function returning {counter: value}
+collectors = {}
+
+def register(name, collect):
+    collectors[name] = collect
+
+def observe(operation, seconds, error = False):
+    with lock:
+        histogram = operations.get(operation)
+        if histogram is None:
+            histogram = operations[operation] = Histogram()
+        histogram.observe(seconds, error)
+
+# times the block as one call of operation, an exception counts as an error and is re-raised
+@contextlib.contextmanager
+def timer(operation):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        observe(operation, time.perf_counter() - start, True)
+        raise
+    observe(operation, time.perf_counter() - start)
+
+def reset():
+    with lock:
+        operations.clear()
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"")
+
+# all operations in the prometheus text exposition format
+def prometheus():
+    lines = [
+        "# HELP collibra_integration_operation_seconds Latency of collibra, okera, mongodb and json operations.",
+        "# TYPE collibra_integration_operation_seconds histogram",
+    ]
+    errors = [
+        "# HELP collibra_integration_operation_errors_total Failed collibra, okera, mongodb and json operations.",
+        "# TYPE collibra_integration_operation_errors_total counter",
+    ]
+    with lock:
+        for operation in sorted(operations):
+            h = operations[operation]
+            label = 'operation="' + escape(operation) + '"'
+            cumulative = 0
+            for bound, n in zip(buckets, h.buckets):
+                cumulative += n
+                lines.append("collibra_integration_operation_seconds_bucket{" + label + ',le="' + repr(bound) + '"} ' + str(cumulative))
+            lines.append("collibra_integration_operation_seconds_bucket{" + label + ',le="+Inf"} ' + str(h.count))
+            lines.append("collibra_integration_operation_seconds_sum{" + label + "} " + repr(h.sum))
+            lines.append("collibra_integration_operation_seconds_count{" + label + "} " + str(h.count))
+            errors.append("collibra_integration_operation_errors_total{" + label + "} " + str(h.errors))
+    counters = [
+        "# HELP collibra_integration_counter Counters and gauges of collibra and okera backends (retries, concurrency limit, circuit breaker).",
+        "# TYPE collibra_integration_counter gauge",
+    ]
+    for name in sorted(collectors):
+        for counter, value in collectors[name]().items():
+            # a gauge without a value yet is left out, "None" is not a valid sample
+            if value is None:
+                continue
+            if isinstance(value, str):
+                counter, value = counter + " " + value, 1
+            counters.append("collibra_integration_counter{source=\"" + escape(name) + "\",counter=\"" + escape(counter) + "\"} " + repr(value))
+    return "\n".join(lines + errors + counters) + "\n"
+
+# table of all operations for the end of a run, sorted by total time
+def summary():
+    rows = [("operation", "calls", "errors", "total s", "mean ms", "p50 ms", "p95 ms", "max ms")]
+    with lock:
+        for operation, h in sorted(operations.items(), key = lambda o: -o[1].sum):
+            rows.append((operation, str(h.count), str(h.errors), "%.3f" % h.sum, "%.2f" % (h.sum / h.count * 1000), "%.2f" % (h.quantile(0.5) * 1000), "%.2f" % (h.quantile(0.95) * 1000), "%.2f" % (h.max * 1000)))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    table = ["  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row)) for row in rows]
+    return "\n".join(table + [name + ": " + str(collectors[name]()) for name in sorted(collectors)])
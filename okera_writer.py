@@ -0,0 +1,150 @@
+import collections
+import contextlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import configs
+import metrics
+from backend import Backend
+from plan import Changes
+
+# TErrorCode names of the okera thrift api that mean the server is overloaded, not that the request was wrong
+busy_codes = ("SERVICE_BUSY",)
+
+# name of the TErrorCode of a TRecordServiceException raised by pyokera, None for any other error
+def error_code(error):
+    if type(error).__name__ != "TRecordServiceException" or getattr(error, 'code', None) is None:
+        return None
+    try:
+        from okera._thrift_api import TErrorCode
+    except ImportError:
+        return None
+    return TErrorCode._VALUES_TO_NAMES.get(error.code)
+
+# okera errors worth retrying: broken or refused connections and timeouts (thrift transport errors included) and a busy server
+# errors are classified by type and error code only, an application error whose message happens to say "too many" is the caller's
+class OkeraBackend(Backend):
+    def error_outcome(self, error):
+        if error_code(error) in busy_codes:
+            return "throttled"
+        if isinstance(error, (OSError, TimeoutError)) or type(error).__name__ == "TTransportException":
+            return "failed"
+        return None
+
+# shared by the harvest and the writer, a retried call takes a fresh connection since the pool drops the one that failed
+backend = OkeraBackend("okera", configs.get('okera backend'))
+
+# pool of open okera connections that are reused for the whole run instead of calling ctx.connect() per change
+# at most size connections are open at once, callers block in connection() until one is free
+class ConnectionPool:
+    def __init__(self, ctx, host, port, size):
+        self.ctx = ctx
+        self.host = host
+        self.port = port
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.opened = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.slots:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                with metrics.timer("okera.connect"):
+                    conn = self.ctx.connect(host = self.host, port = self.port)
+                with self.lock:
+                    self.opened.append(conn)
+            try:
+                yield conn
+            except Exception:
+                # a connection that failed mid-batch is not handed out again
+                self.discard(conn)
+                raise
+            self.idle.put(conn)
+
+    def discard(self, conn):
+        with self.lock:
+            if conn in self.opened:
+                self.opened.remove(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.lock:
+            opened, self.opened = self.opened, []
+        for conn in opened:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+# collects okera changes (tag assignments, DDL) grouped per dataset and applies them in batches
+# every dataset's changes run in order on one pooled connection, independent datasets run in parallel
+class OkeraWriter(Changes):
+    def __init__(self, ctx, host, port, workers = None):
+        self.workers = workers or configs.get('okera workers', 4)
+        self.pool = ConnectionPool(ctx, host, port, self.workers)
+        self.batches = collections.OrderedDict()
+        self.lock = threading.Lock()
+        # (db, dataset) -> (okera calls, seconds) of every applied batch
+        self.timings = collections.OrderedDict()
+
+    # queues a call of the connection method op for the dataset db.dataset
+    def add(self, db, dataset, op, args, kwargs = None):
+        with self.lock:
+            self.batches.setdefault((db, dataset), []).append((op, args, kwargs or {}))
+
+    def send(self, ops):
+        with self.pool.connection() as conn:
+            for op, args, kwargs in ops:
+                with metrics.timer("okera." + op):
+                    getattr(conn, op)(*args, **kwargs)
+
+    # a batch is retried as a whole, its changes (if_not_exists tags, comment DDL) leave the same state when they run twice
+    def apply(self, batch):
+        key, ops = batch
+        start = time.perf_counter()
+        backend.call(lambda: self.send(ops))
+        with self.lock:
+            self.timings[key] = (len(ops), time.perf_counter() - start)
+        return len(ops)
+
+    # applies all queued batches, returns the number of okera calls made
+    def flush(self):
+        with self.lock:
+            batches, self.batches = list(self.batches.items()), collections.OrderedDict()
+        if not batches:
+            return 0
+        with ThreadPoolExecutor(max_workers = self.workers) as pool:
+            return sum(pool.map(self.apply, batches))
+
+    # applies a Plan (see plan.py) with one worker per database, the datasets of a database run one after another in plan order
+    # datasets marked in progress are skipped and every applied dataset is marked right away, so a failed apply can be resumed
+    # returns {database: {'calls': n, 'datasets': n, 'error': None or the text of the exception that stopped the database}}
+    def apply_plan(self, plan, progress = None):
+        def apply_database(item):
+            db, datasets = item
+            result = {'calls': 0, 'datasets': 0, 'error': None}
+            try:
+                for dataset, ops in datasets.items():
+                    if progress and progress.is_done(db, dataset):
+                        continue
+                    result['calls'] += self.apply(((db, dataset), ops))
+                    result['datasets'] += 1
+                    if progress:
+                        progress.mark(db, dataset)
+            except Exception as e:
+                result['error'] = str(e)
+            return db, result
+        if not plan.databases:
+            return collections.OrderedDict()
+        with ThreadPoolExecutor(max_workers = self.workers) as pool:
+            return collections.OrderedDict(pool.map(apply_database, plan.databases.items()))
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,119 @@
+import collections
+import hashlib
+import json
+import os
+import threading
+
+# okera changes queued per dataset, every change is a call of the connection method op with args and kwargs
+# shared by Plan (changes recorded for later) and OkeraWriter (changes applied on flush)
+class Changes:
+    def add(self, db, dataset, op, args, kwargs = None):
+        raise NotImplementedError
+
+    def assign(self, db, dataset, namespace, key, column = None):
+        self.add(db, dataset, "assign_attribute", (namespace, key, db), {'dataset': dataset, 'column': column, 'if_not_exists': True})
+
+    def unassign(self, db, dataset, namespace, key, column = None):
+        self.add(db, dataset, "unassign_attribute", (namespace, key, db), {'dataset': dataset, 'column': column, 'if_not_exists': True})
+
+    def execute_ddl(self, db, dataset, ddl):
+        self.add(db, dataset, "execute_ddl", (ddl,))
+
+# change plan computed by export.py before anything is changed in okera
+# changes are grouped by database, then dataset, in planning order, and the whole plan is saved as json
+# the plan id is a hash over the changes, progress of an apply is tracked against it
+class Plan(Changes):
+    def __init__(self, databases = None):
+        self.databases = databases if databases is not None else collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, db, dataset, op, args, kwargs = None):
+        with self.lock:
+            self.databases.setdefault(db, collections.OrderedDict()).setdefault(dataset, []).append([op, list(args), kwargs or {}])
+
+    @property
+    def id(self):
+        return hashlib.sha1(json.dumps(self.databases).encode("utf-8")).hexdigest()[:12]
+
+    # {database: {'datasets': n, 'calls': n, op: n, ...}}
+    def counts(self):
+        counts = collections.OrderedDict()
+        for db, datasets in self.databases.items():
+            count = collections.Counter()
+            count['datasets'] = len(datasets)
+            for ops in datasets.values():
+                count['calls'] += len(ops)
+                for op, args, kwargs in ops:
+                    count[op] += 1
+            counts[db] = count
+        return counts
+
+    def calls(self):
+        return sum(len(ops) for datasets in self.databases.values() for ops in datasets.values())
+
+    # estimated apply time: every database is one unit of work, databases go to the least busy of workers
+    # call_seconds is the assumed duration of one okera call
+    def estimate(self, workers, call_seconds):
+        busy = [0.0] * max(workers, 1)
+        for calls in sorted((c['calls'] for c in self.counts().values()), reverse = True):
+            busy[busy.index(min(busy))] += calls * call_seconds
+        return {'databases': len(self.databases), 'datasets': sum(len(d) for d in self.databases.values()), 'calls': self.calls(), 'workers': workers, 'seconds': round(max(busy), 3)}
+
+    # readable plan, every change with changes = True, otherwise one line per database
+    def describe(self, workers, call_seconds, changes = False):
+        lines = ["plan " + self.id]
+        for db, count in self.counts().items():
+            ops = ", ".join(op + " " + str(n) for op, n in count.items() if op not in ('datasets', 'calls'))
+            lines.append(db + ": " + str(count['calls']) + " okera calls on " + str(count['datasets']) + " datasets (" + ops + ")")
+            if changes:
+                for dataset, dataset_ops in self.databases[db].items():
+                    for op, args, kwargs in dataset_ops:
+                        column = kwargs.get('column')
+                        target = db + "." + dataset + ("." + column if column else "")
+                        lines.append("  " + op + " " + target + ": " + (args[0] if op == "execute_ddl" else args[0] + "." + args[1]))
+        estimate = self.estimate(workers, call_seconds)
+        lines.append("estimated cost: " + str(estimate['calls']) + " okera calls on " + str(estimate['datasets']) + " datasets in " + str(estimate['databases']) + " databases, about " + str(estimate['seconds']) + "s with " + str(workers) + " workers")
+        return "\n".join(lines)
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding = "utf-8") as f:
+            json.dump({'id': self.id, 'databases': self.databases}, f, ensure_ascii = False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, encoding = "utf-8") as f:
+            saved = json.load(f, object_pairs_hook = collections.OrderedDict)
+        return Plan(saved.get('databases'))
+
+# datasets of a plan that are already applied, appended to path as soon as each one is done
+# the first line is the plan id, a file written for another plan (or a fresh apply with resume = False) starts over
+class Progress:
+    def __init__(self, path, plan_id, resume = True):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = set()
+        lines = []
+        if resume and os.path.exists(path):
+            with open(path, encoding = "utf-8") as f:
+                lines = f.read().splitlines()
+        if lines and lines[0] == plan_id:
+            self.done = set(tuple(line.split("\t", 1)) for line in lines[1:] if "\t" in line)
+            self.file = open(path, 'a', encoding = "utf-8")
+        else:
+            self.file = open(path, 'w', encoding = "utf-8")
+            self.file.write(plan_id + "\n")
+            self.file.flush()
+
+    def is_done(self, db, dataset):
+        return (db, dataset) in self.done
+
+    def mark(self, db, dataset):
+        with self.lock:
+            self.done.add((db, dataset))
+            self.file.write(db + "\t" + dataset + "\n")
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
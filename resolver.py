@@ -0,0 +1,88 @@
+import metrics
+
+# in-memory copy of the asset type and relation type reference tables seeded by db.py
+# the collections are small, so they are loaded once and every lookup during generation is a dict access
+
+# (asset type, related asset type) -> (head, tail) of the relation type that connects them
+# a related type of None is the fallback for an asset type, the same precedence create_relation used to apply
+relation_pairs = {
+    ("Schema", "Database"): ("Technology Asset", "Schema"),
+    ("Database", None): ("Technology Asset", "Schema"),
+    ("Table", "Schema"): ("Schema", "Table"),
+    ("Schema", None): ("Schema", "Table"),
+    ("Column", "Table"): ("Column", "Table"),
+    ("Table", None): ("Column", "Table"),
+}
+
+# defines the type i.e. the direction of the relation, a database is a technology asset
+def relation_direction(asset_type, head):
+    if asset_type == "Database":
+        asset_type = "Technology Asset"
+    if asset_type == head:
+        return ":TARGET"
+    else:
+        return ":SOURCE"
+
+class Resolver:
+    def __init__(self, db):
+        self.db = db
+        self.queries = 0
+        self.version = None
+        self.refresh()
+
+    # version written by db.py for every reseed, falls back to document count and newest _id for collections seeded some other way
+    def signature(self):
+        seeded = self.db.seed_versions.find_one({'_id': "reference data"})
+        self.queries += 1
+        if seeded:
+            return seeded.get('version')
+        signature = []
+        for collection in (self.db.asset_ids, self.db.relation_ids):
+            newest = collection.find_one({}, {'_id': 1}, sort = [('_id', -1)])
+            signature.append((collection.estimated_document_count(), newest.get('_id') if newest else None))
+            self.queries += 2
+        return tuple(signature)
+
+    # reloads the reference tables if the seed collections changed since the last load, returns True if it did
+    def refresh(self):
+        with metrics.timer("mongo.reference_signature"):
+            version = self.signature()
+        if version == self.version:
+            return False
+        self.load()
+        self.version = version
+        return True
+
+    def load(self):
+        with metrics.timer("mongo.reference_data"):
+            self.read()
+
+    def read(self):
+        self.assets = {}
+        for x in self.db.asset_ids.find({}, {'_id': 0}):
+            self.assets.setdefault(x.get('name'), {'name': x.get('name'), 'id': x.get('id')})
+        self.relation_ids = {}
+        for x in self.db.relation_ids.find({}, {'_id': 0}):
+            self.relation_ids.setdefault((x.get('head'), x.get('tail')), {'head': x.get('head'), 'id': x.get('id')})
+        self.queries += 2
+        # precomputed (asset type, related type) -> "relation id:DIRECTION"
+        self.relations = {}
+        for (asset_type, related_type), head_tail in relation_pairs.items():
+            info = self.relation_ids.get(head_tail)
+            if info:
+                self.relations[(asset_type, related_type)] = info.get('id') + relation_direction(asset_type, info.get('head'))
+
+    # finds asset type id and name
+    def asset(self, name):
+        return self.assets.get(name)
+
+    # finds relation type id and head
+    def relation_id(self, head, tail):
+        return self.relation_ids.get((head, tail))
+
+    # relation type and direction used for an asset of asset_type pointing at an asset of related_type
+    def relation(self, asset_type, related_type):
+        relation = self.relations.get((asset_type, related_type))
+        if relation is None:
+            relation = self.relations.get((asset_type, None))
+        return relation
@@ -0,0 +1,149 @@
+import json
+import sqlite3
+import threading
+import time
+
+# on-disk snapshot of the harvested okera metadata, shared by json-gen.py and export.py between runs
+# one sqlite file with the time every database was harvested and one compact json row per dataset
+# datasets are read back in harvest order as light objects with the pyokera attributes the scripts use, a column schema is only decoded when it is accessed
+
+version = 2
+
+class Attribute:
+    __slots__ = ('attribute_namespace', 'key')
+
+    def __init__(self, attribute_namespace, key):
+        self.attribute_namespace = attribute_namespace
+        self.key = key
+
+class AttributeValue:
+    __slots__ = ('attribute',)
+
+    def __init__(self, attribute):
+        self.attribute = attribute
+
+class ColumnType:
+    __slots__ = ('type_id', 'precision', 'scale', 'len')
+
+    def __init__(self, type_id, precision, scale, len):
+        self.type_id = type_id
+        self.precision = precision
+        self.scale = scale
+        self.len = len
+
+class Column:
+    __slots__ = ('name', 'type', 'comment', 'attribute_values')
+
+    def __init__(self, name, type, comment, attribute_values):
+        self.name = name
+        self.type = type
+        self.comment = comment
+        self.attribute_values = attribute_values
+
+class Schema:
+    __slots__ = ('cols',)
+
+    def __init__(self, cols):
+        self.cols = cols
+
+class Dataset:
+    __slots__ = ('db', 'name', 'description', 'primary_storage', 'attribute_values', 'packed_cols', 'unpacked_schema')
+
+    def __init__(self, db, name, description, primary_storage, attribute_values, packed_cols):
+        self.db = [db]
+        self.name = name
+        self.description = description
+        self.primary_storage = primary_storage
+        self.attribute_values = attribute_values
+        self.packed_cols = packed_cols
+        self.unpacked_schema = None
+
+    @property
+    def schema(self):
+        if self.unpacked_schema is None:
+            self.unpacked_schema = Schema([Column(name, ColumnType(*type), comment, unpack_tags(tags)) for name, type, comment, tags in json.loads(self.packed_cols)])
+        return self.unpacked_schema
+
+# attribute_values as [namespace, key] pairs and back
+def pack_tags(attribute_values):
+    if attribute_values:
+        return [[value.attribute.attribute_namespace, value.attribute.key] for value in attribute_values]
+
+def unpack_tags(tags):
+    if tags:
+        return [AttributeValue(Attribute(namespace, key)) for namespace, key in tags]
+
+def pack_cols(dataset):
+    schema = getattr(dataset, 'schema', None)
+    cols = []
+    for col in (schema.cols if schema else None) or []:
+        type = [col.type.type_id, getattr(col.type, 'precision', None), getattr(col.type, 'scale', None), getattr(col.type, 'len', None)]
+        cols.append([col.name, type, col.comment, pack_tags(col.attribute_values)])
+    return json.dumps(cols, ensure_ascii = False, separators = (",", ":"))
+
+class HarvestSnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout = 30, check_same_thread = False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA mmap_size = 268435456")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != version:
+            with self.conn:
+                for table in ("databases", "datasets", "database_list"):
+                    self.conn.execute("DROP TABLE IF EXISTS " + table)
+                self.conn.execute("PRAGMA user_version = " + str(version))
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS databases (name TEXT PRIMARY KEY, harvested REAL NOT NULL, tables TEXT)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS datasets (database TEXT NOT NULL, name TEXT NOT NULL, position INTEGER NOT NULL, description TEXT, primary_storage TEXT, tags TEXT, cols TEXT NOT NULL, PRIMARY KEY (database, name)) WITHOUT ROWID")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS database_list (id INTEGER PRIMARY KEY CHECK (id = 1), names TEXT NOT NULL, harvested REAL NOT NULL)")
+
+    # seconds since database was harvested, None if it is not in the snapshot
+    def age(self, database):
+        with self.lock:
+            row = self.conn.execute("SELECT harvested FROM databases WHERE name = ?", (database,)).fetchone()
+        return time.time() - row[0] if row else None
+
+    # tables_key identifies the table patterns of the harvest (see harvest.Scope), a snapshot of all tables (None) is fresh for any patterns
+    def is_fresh(self, database, max_age, tables_key = None):
+        with self.lock:
+            row = self.conn.execute("SELECT harvested, tables FROM databases WHERE name = ?", (database,)).fetchone()
+        return row is not None and time.time() - row[0] <= max_age and row[1] in (None, tables_key)
+
+    # the list_databases() result, None if it is older than max_age seconds or was never stored
+    def database_list(self, max_age):
+        with self.lock:
+            row = self.conn.execute("SELECT names, harvested FROM database_list WHERE id = 1").fetchone()
+        if row and time.time() - row[1] <= max_age:
+            return json.loads(row[0])
+
+    # stores the list_databases() result, databases that no longer exist are dropped from the snapshot
+    def save_database_list(self, names):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO database_list VALUES (1, ?, ?)", (json.dumps(names), time.time()))
+            gone = [row[0] for row in self.conn.execute("SELECT name FROM databases") if row[0] not in names]
+            for database in gone:
+                self.conn.execute("DELETE FROM databases WHERE name = ?", (database,))
+                self.conn.execute("DELETE FROM datasets WHERE database = ?", (database,))
+
+    def load(self, database):
+        with self.lock:
+            rows = self.conn.execute("SELECT name, description, primary_storage, tags, cols FROM datasets WHERE database = ? ORDER BY position", (database,)).fetchall()
+        return [Dataset(database, name, description, primary_storage, unpack_tags(json.loads(tags)), cols) for name, description, primary_storage, tags, cols in rows]
+
+    # replaces the datasets of database and marks it as harvested now, with the table patterns they were harvested with
+    def save(self, database, datasets, tables_key = None):
+        rows = [(database, t.name, position, t.description, t.primary_storage, json.dumps(pack_tags(t.attribute_values)), pack_cols(t)) for position, t in enumerate(datasets)]
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM datasets WHERE database = ?", (database,))
+            self.conn.executemany("INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO databases VALUES (?, ?, ?)", (database, time.time(), tables_key))
+
+    # forgets when databases were harvested so the next run harvests them again, e.g. after export.py changed them
+    def invalidate(self, databases):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM databases WHERE name = ?", [(database,) for database in databases])
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
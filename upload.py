@@ -0,0 +1,176 @@
+import json
+import os
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from config import configs
+import collibra
+import json_writer
+import metrics
+
+# uploads the shards written by json-gen.py (see ShardedJsonWriter) to the collibra import API
+# shards of one phase run as parallel import jobs, a phase only starts once every shard of the previous phase is imported
+# a failed shard is retried on its own, the rest of its phase is not redone
+
+finished_states = ["COMPLETED", "ERROR", "CANCELED"]
+
+def import_params(file_name):
+    return {
+        'sendNotification': True,
+        'batchSize': str(configs.get('import batch size', 10000)),
+        'simulation': False,
+        'fileName': file_name,
+        'deleteFile': False,
+    }
+
+# generator over a multipart/form-data body: the form fields, then the file read from disk chunk by chunk
+def multipart_body(fields, file_path, boundary, chunk_size):
+    for name, value in fields.items():
+        yield ("--" + boundary + "\r\nContent-Disposition: form-data; name=\"" + name + "\"\r\n\r\n" + str(value) + "\r\n").encode("utf-8")
+    yield ("--" + boundary + "\r\nContent-Disposition: form-data; name=\"file\"; filename=\"" + os.path.basename(file_path) + "\"\r\nContent-Type: application/json\r\n\r\n").encode("utf-8")
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    yield ("\r\n--" + boundary + "--\r\n").encode("utf-8")
+
+# compresses a stream of byte chunks on the fly, the gzip output is never held as a whole
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+# counts raw and sent bytes of the chunks passing through
+def counted(chunks, stats, key):
+    for chunk in chunks:
+        stats[key] += len(chunk)
+        yield chunk
+
+# posts file_path with the import form fields to path as a streamed (chunked) multipart body
+# with 'upload compression' set to gzip the body is compressed while it is sent (off by default, see config.py)
+# returns the response and the upload stats (bytes read, bytes sent, seconds, throughput)
+def post_file(path, file_path, file_name = None):
+    boundary = uuid.uuid4().hex
+    stats = {'file bytes': os.path.getsize(file_path), 'body bytes': 0, 'bytes sent': 0}
+    body = counted(multipart_body(import_params(file_name or os.path.basename(file_path)), file_path, boundary, configs.get('upload chunk size', 1024 * 1024)), stats, 'body bytes')
+    headers = {'Content-Type': "multipart/form-data; boundary=" + boundary}
+    if configs.get('upload compression') == "gzip":
+        body = gzip_stream(body)
+        headers['Content-Encoding'] = "gzip"
+    start = time.perf_counter()
+    with metrics.timer("collibra.import"):
+        response = collibra.session.post(collibra.url(path), data = counted(body, stats, 'bytes sent'), headers = headers)
+    stats['seconds'] = round(time.perf_counter() - start, 3)
+    stats['MB/s'] = round(stats['body bytes'] / 1e6 / stats['seconds'], 3) if stats['seconds'] else None
+    return response, stats
+
+# starts an import job for one file, returns the collibra job and the upload stats
+def submit(path, file_path):
+    response, stats = post_file(path, file_path)
+    response.raise_for_status()
+    return json.loads(response.content), stats
+
+# polls /jobs/{id} until the job is finished, returns its final state
+# the poll interval starts at 'job poll interval' and doubles up to 'job poll max interval', on_progress gets every polled job
+# an error response (e.g. 401 or 404), an answer without a state or a job still running after timeout seconds ('job timeout') raises
+def wait_for_job(job_id, interval = None, on_progress = None, timeout = None):
+    interval = interval or configs.get('job poll interval', 2)
+    max_interval = configs.get('job poll max interval', 30)
+    deadline = time.monotonic() + (timeout or configs.get('job timeout', 3600))
+    while True:
+        with metrics.timer("collibra.jobs"):
+            response = collibra.session.get(collibra.url("/jobs/" + str(job_id)))
+        response.raise_for_status()
+        job = json.loads(response.content)
+        if not job.get('state'):
+            raise ValueError("collibra job " + str(job_id) + " has no state: " + response.text[:200])
+        if on_progress:
+            on_progress(job)
+        if job.get('state') in finished_states:
+            return job
+        if time.monotonic() + interval > deadline:
+            raise TimeoutError("collibra job " + str(job_id) + " not finished after " + str(timeout or configs.get('job timeout', 3600)) + "s, last state " + str(job.get('state')))
+        time.sleep(interval)
+        interval = min(interval * 2, max_interval)
+
+# imports one shard, retrying it up to retries times, returns a summary of the last attempt
+def upload_shard(path, file_path, retries):
+    attempt = 0
+    stats = None
+    while True:
+        attempt += 1
+        try:
+            job, stats = submit(path, file_path)
+            job = wait_for_job(job.get('id'))
+            state = job.get('state')
+            error = job.get('message') if state != "COMPLETED" else None
+        except Exception as e:
+            state, error = "ERROR", str(e)
+        if state == "COMPLETED" or attempt > retries:
+            return {'file': os.path.basename(file_path), 'state': state, 'attempts': attempt, 'error': error, 'upload': stats}
+
+# {'complete': True if the shards hold every asset, 'generation': id of the generation run, 'shards': [{'file', 'phase'}]}
+# a manifest written before completeness was recorded (a plain shard list) counts as incomplete and has no generation
+def read_manifest(directory = None):
+    directory = directory or configs.get('shard directory', './shards')
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        return {'complete': False, 'generation': None, 'shards': manifest}
+    return manifest
+
+# generation id of a single output file (see JsonArrayWriter), None for a file without sidecar
+def read_generation(file_path):
+    try:
+        with open(json_writer.meta_path(file_path)) as f:
+            return json.load(f).get('generation')
+    except FileNotFoundError:
+        return None
+
+# uploads all shards listed in directory/manifest.json to path, at most in_flight import jobs at a time
+# stops before the next phase if a shard of the current phase still failed after its retries
+# on_shard is called with every finished shard result
+def upload_shards(path, directory = None, in_flight = None, retries = None, on_shard = None):
+    directory = directory or configs.get('shard directory', './shards')
+    in_flight = in_flight or configs.get('import jobs in flight', 4)
+    retries = configs.get('shard retries', 2) if retries is None else retries
+    shards = read_manifest(directory).get('shards')
+    phases = []
+    for shard in shards:
+        if not phases or phases[-1][0] != shard.get('phase'):
+            phases.append((shard.get('phase'), []))
+        phases[-1][1].append(os.path.join(directory, shard.get('file')))
+    results = []
+    def shard_done(result):
+        if on_shard:
+            on_shard(result)
+        return result
+    with ThreadPoolExecutor(max_workers = in_flight) as pool:
+        for phase, files in phases:
+            phase_results = list(pool.map(lambda f: shard_done(upload_shard(path, f, retries)), files))
+            results.extend(phase_results)
+            if any(r.get('state') != "COMPLETED" for r in phase_results):
+                break
+    return results
+
+# shards of a synchronization are all imported under the same synchronization id, which is only finalized once every shard is imported
+# finalize removes every asset of the synchronization missing from the shards, so it is skipped unless the manifest says they are complete
+def sync_shards(sync_id, on_shard = None):
+    complete = read_manifest().get('complete')
+    results = upload_shards("/import/synchronize/" + sync_id + "/json-job", on_shard = on_shard)
+    if not results or not all(r.get('state') == "COMPLETED" for r in results):
+        return {'shards': results}
+    if not complete:
+        return {'shards': results, 'finalize': {'state': "SKIPPED", 'message': "shards are not a complete generation (delta export, scoped or failed harvest), nothing is removed"}}
+    response = collibra.session.post(collibra.url("/import/synchronize/" + sync_id + "/finalize/job"))
+    response.raise_for_status()
+    job = wait_for_job(json.loads(response.content).get('id'))
+    if job.get('state') != "COMPLETED":
+        raise RuntimeError("finalize job " + str(job.get('id')) + " ended as " + str(job.get('state')) + ": " + str(job.get('message')))
+    return {'shards': results, 'finalize': job}
@@ -0,0 +1,206 @@
+import glob
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import configs
+from catalog import Catalog
+import collibra
+import components
+import metrics
+from harvest import harvest, invalidate_snapshot, Scope
+from okera_writer import OkeraWriter
+import export
+
+# continuous collibra -> okera sync, the daemon mode of export.py
+# every poll reads the assets of the community newest first ('sortField' LAST_MODIFIED) and stops at the watermark, the lastModifiedOn of the last applied change
+# only the changed tables and columns get their description and tags fetched and only their okera datasets are listed, so a poll costs about one request when nothing changed
+# the watermark is kept in the sync_state collection of the collibra_ids database, without one the first poll is a full export.py run
+# propagation lag (collibra edit to okera change) is recorded as the sync.propagation_lag operation and in the sync counters of metrics.py
+
+watermark_id = "collibra watermark"
+
+class Watcher:
+    def __init__(self, ctx, writer, state, scope = None, page_size = None):
+        self.ctx = ctx
+        self.writer = writer
+        self.state = state
+        # same databases as export.py
+        self.scope = scope or Scope(include_databases = configs.get('sync databases'))
+        self.page_size = page_size or configs.get('sync page size', 100)
+        self.lock = threading.Lock()
+        self.counts = {'polls': 0, 'failed polls': 0, 'changed assets': 0, 'okera calls': 0, 'last lag': 0.0, 'max lag': 0.0, 'watermark age': 0.0}
+        metrics.register("sync", self.stats)
+
+    # {'modified': lastModifiedOn in ms, 'ids': ids of the assets applied with exactly that timestamp}, None before the first sync
+    def watermark(self):
+        return self.state.find_one({'_id': watermark_id})
+
+    def save_watermark(self, watermark):
+        self.state.replace_one({'_id': watermark_id}, dict(watermark, _id = watermark_id), upsert = True)
+
+    # assets modified after watermark, newest first, read page by page until the first older asset
+    # assets with the watermark's own timestamp count as changed unless they were applied with it
+    def changed_assets(self, watermark, limit = None):
+        params = {'communityId': components.community_id(), 'simulation': False, 'sortField': "LAST_MODIFIED", 'sortOrder': "DESC"}
+        changed = []
+        offset = 0
+        while True:
+            page_size = min(self.page_size, limit - len(changed)) if limit else self.page_size
+            with metrics.timer("sync.changes"):
+                data = collibra.get("/assets", params = dict(params, offset = offset, limit = page_size))
+            results = data.get('results') or []
+            for asset in results:
+                modified = asset.get('lastModifiedOn') or 0
+                if watermark and modified < watermark.get('modified'):
+                    return changed
+                if watermark and modified == watermark.get('modified') and asset.get('id') in watermark.get('ids'):
+                    continue
+                changed.append(asset)
+            offset += len(results)
+            # same end of list test as collibra.iter_pages, total wins over a page capped by the server
+            total = data.get('total')
+            if not results or (offset >= total if total is not None else len(results) < page_size) or (limit and len(changed) >= limit):
+                return changed
+
+    # watermark after applying changed on top of watermark
+    @staticmethod
+    def next_watermark(watermark, changed):
+        if not changed:
+            return watermark
+        modified = max(asset.get('lastModifiedOn') or 0 for asset in changed)
+        ids = [asset.get('id') for asset in changed if asset.get('lastModifiedOn') == modified]
+        if watermark and watermark.get('modified') == modified:
+            ids = watermark.get('ids') + ids
+        return {'modified': modified, 'ids': ids}
+
+    # (database, table) of a changed table or column asset in scope, None for other assets
+    def target(self, asset):
+        if asset.get('type', {}).get('name') not in ("Table", "Column"):
+            return None
+        parts = asset.get('name', "").split(".")
+        if len(parts) != (2 if asset.get('type').get('name') == "Table" else 3):
+            return None
+        if not self.scope.database(parts[0]) or not self.scope.table(parts[0], parts[1]):
+            return None
+        return parts[0], parts[1]
+
+    # applies the description and tags of the changed assets to their okera tables and columns, returns False if okera could not be changed completely
+    def apply(self, changed):
+        assets = [asset for asset in changed if self.target(asset)]
+        if not assets:
+            return True
+        catalog = Catalog()
+        for d, (description, tags) in zip(assets, collibra.get_details([d.get('id') for d in assets])):
+            catalog.add({'name': d.get('name'), 'display name': d.get('displayName'), 'description': description, 'type': d.get('type').get('name'), 'domain': d.get('domain').get('name'), 'status': d.get('status').get('name'), 'tags': tags})
+        # only the affected datasets are listed, straight from okera since the harvest snapshot may be older than the change
+        tables = sorted(set(self.target(asset) for asset in assets))
+        databases = sorted(set(db for db, table in tables))
+        scope = Scope(include_databases = [glob.escape(db) for db in databases], include_tables = [glob.escape(db + "." + table) for db, table in tables])
+        elements = list(harvest(self.ctx, databases, scope = scope))
+        plan = export.plan_changes(catalog, elements, partial = True)
+        results = self.writer.apply_plan(plan)
+        invalidate_snapshot([db for db, r in results.items() if r.get('calls')])
+        with self.lock:
+            self.counts['okera calls'] += sum(r.get('calls') for r in results.values())
+        for db, r in results.items():
+            if r.get('error'):
+                print("database " + db + " stopped: " + r.get('error'))
+        for element in elements:
+            if element.get('error'):
+                print("database " + element.get('database') + " not listed: " + element.get('error'))
+        if any(r.get('error') for r in results.values()) or any(e.get('error') for e in elements):
+            return False
+        if plan.calls():
+            print("applied " + str(plan.calls()) + " okera changes for " + str(len(assets)) + " changed collibra assets")
+        return True
+
+    # one poll: reads the changes since the watermark, applies them and moves the watermark forward
+    # a poll that fails keeps the watermark, so the next one tries the same changes again
+    def poll(self):
+        watermark = self.watermark()
+        if watermark is None:
+            # the newest change before the full run is the starting point, later edits are picked up by the next poll
+            newest = self.changed_assets(None, limit = 1)
+            print("no watermark, running a full export first")
+            # the full export always applies its plan, 'sync dry run' only applies to export.py runs
+            if not export.run(dry_run = False, resume = False):
+                raise RuntimeError("full export did not finish")
+            watermark = self.next_watermark(None, newest) or {'modified': 0, 'ids': []}
+            self.save_watermark(watermark)
+            return watermark
+        changed = self.changed_assets(watermark)
+        if changed and not self.apply(changed):
+            raise RuntimeError("okera changes failed, watermark kept")
+        # lag from the collibra edit to the end of its okera change
+        now = time.time()
+        for asset in filter(self.target, changed):
+            lag = max(0.0, now - (asset.get('lastModifiedOn') or 0) / 1000.0)
+            metrics.observe("sync.propagation_lag", lag)
+            with self.lock:
+                self.counts['last lag'] = round(lag, 3)
+                self.counts['max lag'] = max(self.counts['max lag'], round(lag, 3))
+        watermark = self.next_watermark(watermark, changed)
+        if changed:
+            self.save_watermark(watermark)
+        with self.lock:
+            self.counts['polls'] += 1
+            self.counts['changed assets'] += len(changed)
+            self.counts['watermark age'] = round(time.time() - watermark.get('modified') / 1000.0, 3)
+        return watermark
+
+    # polls every interval seconds (counted from the start of a poll) until interrupted, once = True polls a single time
+    def run(self, interval, once = False):
+        while True:
+            start = time.monotonic()
+            try:
+                with metrics.timer("sync.poll"):
+                    self.poll()
+            except Exception as e:
+                with self.lock:
+                    self.counts['failed polls'] += 1
+                print("sync poll failed: " + str(e))
+            if once:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+# serves metrics.prometheus() on port from a background thread, for a daemon not running inside app.py
+def serve_metrics(port):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            data = metrics.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header('Content-Type', "text/plain; version=0.0.4")
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target = server.serve_forever, daemon = True).start()
+    return server
+
+# interval and the metrics port default to 'sync poll interval' and 'sync metrics port'
+def run(once = False, interval = None, metrics_port = None):
+    interval = interval or configs.get('sync poll interval', 10)
+    metrics_port = metrics_port or configs.get('sync metrics port')
+    if metrics_port and not once:
+        serve_metrics(metrics_port)
+    ctx = components.okera()
+    writer = OkeraWriter(ctx, configs.get('host'), configs.get('port'), configs.get('okera workers', 4))
+    watcher = Watcher(ctx, writer, components.database().sync_state)
+    try:
+        watcher.run(interval, once)
+    finally:
+        writer.close()
+        if once:
+            print(metrics.summary())
+
+if __name__ == "__main__":
+    run()